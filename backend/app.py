@@ -9,15 +9,34 @@ Version: 2.2.0 - Full Technical Insights
 """
 
 import os
+import time
+import asyncio
 import logging
+from functools import partial
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 from typing import List, Optional, Dict
 
-from .ml import predict_url, extract_urls, MODEL_LOADED, URLPrediction
-from .llm import analyze_message_with_llm, is_llm_available, LLMAnalysis, is_trusted_domain
+from .ml import (
+    predict_urls, blocklist_prediction, URLPrediction, warm_up_model, is_model_loaded,
+    get_model_status
+)
+from .batching import InferenceBatcher
+from .keywords import scan_keywords
+from .context import MessageContext
+from .rules import rule_registry
+from .trust import trusted_domains
+from .urls import parse_url, parse_urls, parse_cache_stats
+from .translations import red_flag_catalog
+from .homograph import brand_index
+from .blocklist import blocklist
+from .reference_data import reference_data
+from .llm import analyze_message_with_llm, is_llm_available, LLMAnalysis, llm_call_pool, llm_single_flight, llm_gateway
+from .llm_cache import llm_verdict_cache
+from .near_duplicate import near_duplicate_index
 
 logging.basicConfig(
     level=logging.INFO,
@@ -25,12 +44,40 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Load and warm up the ML model before the worker accepts traffic"""
+    start = time.perf_counter()
+    warm = await asyncio.to_thread(warm_up_model)
+    model_status = get_model_status()
+    logger.info(
+        f"Worker {model_status['pid']} model warm-up {'complete' if warm else 'failed'} "
+        f"in {time.perf_counter() - start:.2f}s (storage: {model_status['storage']}, "
+        f"RSS: {model_status['rss_mb']} MB, shared: {model_status['shared_mb']} MB)"
+    )
+    inference_batcher.start()
+    executor_ready = await inference_batcher.warm_up()
+    logger.info(
+        f"ML stage running in '{inference_batcher.executor_mode}' executor mode "
+        f"({inference_batcher.executor_workers} workers, ready: {executor_ready})"
+    )
+    yield
+    await inference_batcher.shutdown()
+    llm_call_pool.shutdown()
+    llm_verdict_cache.close()
+
+
 app = FastAPI(
     title="Tanabbah Enhanced API v2.2",
     description="AI-powered phishing detection with complete technical insights",
-    version="2.2.0"
+    version="2.2.0",
+    lifespan=lifespan
 )
 
+# URL scoring requests from all in-flight requests are flushed together
+# (score_urls answers blocklisted URLs before they reach the batcher)
+inference_batcher = InferenceBatcher(partial(predict_urls, check_blocklist=False))
+
 ALLOWED_ORIGINS = os.getenv("ALLOWED_ORIGINS", "*").split(",")
 app.add_middleware(
     CORSMiddleware,
@@ -80,7 +127,7 @@ class AnalyzeResponse(BaseModel):
 
 def classify_url_type(probability: float, url: str) -> str:
     """Classify URL based on probability and characteristics"""
-    if is_trusted_domain(url):
+    if parse_url(url).is_trusted:
         return "Trusted"
     elif probability >= 0.8:
         return "Phishing"
@@ -92,6 +139,41 @@ def classify_url_type(probability: float, url: str) -> str:
         return "Safe"
 
 
+async def score_urls(urls: List[str]) -> tuple:
+    """
+    Score all extracted URLs through the shared inference batcher
+    Returns: (url_predictions, ml_risk_score)
+    """
+    try:
+        # Feed updates are applied in the serving process (the ML executor may be other processes)
+        if blocklist.update_due():
+            await asyncio.to_thread(blocklist.refresh)
+        
+        # Blocklisted URLs are answered here, without queuing any model work
+        blocked = {url: pred for url in urls if (pred := blocklist_prediction(url)) is not None}
+        pending = [url for url in urls if url not in blocked]
+        scored = iter(await inference_batcher.predict(pending) if pending else [])
+        url_predictions = [blocked.get(url) or next(scored) for url in urls]
+    except Exception as e:
+        logger.error(f"Error predicting URLs {urls}: {e}")
+        url_predictions = [
+            URLPrediction(url=url, prediction=0, probability=0.5, features={}, verdict_source="fallback")
+            for url in urls
+        ]
+    
+    total_prob = 0.0
+    for pred in url_predictions:
+        total_prob += pred.probability
+    
+    # ML risk score
+    ml_risk_score = round(
+        (total_prob / len(url_predictions) * 100) if url_predictions else 0.0,
+        2
+    )
+    
+    return url_predictions, ml_risk_score
+
+
 def get_action_guidance(classification: str, language: str = "ar") -> tuple:
     """Get action guidance based on classification"""
     actions = {
@@ -159,7 +241,7 @@ def calculate_enhanced_risk(
     """
     
     # Check if all URLs are trusted
-    all_trusted = all(is_trusted_domain(url) for url in urls) if urls else False
+    all_trusted = all(parsed.is_trusted for parsed in parse_urls(urls)) if urls else False
     
     # Check for critical red flags
     has_critical_flags = False
@@ -177,8 +259,20 @@ def calculate_enhanced_risk(
     # Remove duplicates
     url_types = list(set(url_types))
     
-    # === TRUST OVERRIDE ===
-    if all_trusted and urls:
+    # === BLOCKLIST OVERRIDE ===
+    blocked = [pred for pred in url_predictions if pred.is_blocklisted]
+    if blocked:
+        # Confirmed phishing links: definitive verdict, nothing else can lower it
+        risk_score = 100.0
+        classification = "HIGH_RISK"
+        classification_ar = "عالية الخطورة"
+        red_flags_details = [
+            f"⛔ رابط احتيال معروف: {pred.url} (المصدر: {pred.verdict_source.split(':', 1)[1]})"
+            if language == "ar" else
+            f"⛔ Known phishing link: {pred.url} (source: {pred.verdict_source.split(':', 1)[1]})"
+            for pred in blocked
+        ]
+    elif all_trusted and urls:
         # Check for conflicting signals even with trusted domains
         has_suspicious_content = False
         if llm_analysis:
@@ -284,7 +378,9 @@ def calculate_enhanced_risk(
     
     # === TECHNICAL DETAILS ===
     analysis_method = "Hybrid (ML + LLM)" if llm_analysis else "ML Only"
-    if all_trusted and urls:
+    if blocked:
+        analysis_method = "Blocklist"
+    elif all_trusted and urls:
         analysis_method += " + Trust Override"
     
     technical_details = TechnicalDetails(
@@ -308,8 +404,9 @@ async def root():
         "service": "Tanabbah Enhanced API",
         "version": "2.2.0",
         "features": ["complete_technical_insights", "multi_language", "trust_override"],
-        "model_loaded": MODEL_LOADED,
-        "llm_enabled": is_llm_available()
+        "model_loaded": is_model_loaded(),
+        "llm_enabled": is_llm_available(),
+        "llm_gateway": llm_gateway.stats()
     }
 
 
@@ -318,8 +415,46 @@ async def health_check():
     return {
         "status": "healthy",
         "version": "2.2.0",
-        "model_loaded": MODEL_LOADED,
-        "llm_enabled": is_llm_available()
+        "model_loaded": is_model_loaded(),
+        "llm_enabled": is_llm_available(),
+        "llm_gateway": llm_gateway.stats()
+    }
+
+
+@app.get("/ready")
+async def readiness_check():
+    """Readiness probe - 503 until the model is loaded and warmed up"""
+    model_status = get_model_status()
+    ready = model_status["warm"]
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "status": "ready" if ready else "starting",
+            "version": "2.2.0",
+            **model_status
+        }
+    )
+
+
+@app.get("/api/metrics")
+async def metrics():
+    """Cache and pipeline counters for monitoring"""
+    return {
+        "status": "success",
+        "url_cache": inference_batcher.url_cache_stats(),
+        "inference_batcher": inference_batcher.stats(),
+        "rules": rule_registry.stats(),
+        "trusted_domains": trusted_domains.stats(),
+        "parsed_urls": parse_cache_stats(),
+        "red_flag_translations": red_flag_catalog.stats(),
+        "protected_brands": brand_index.stats(),
+        "blocklist": blocklist.stats(),
+        "reference_data": reference_data.stats(),
+        "llm_calls": llm_call_pool.stats(),
+        "llm_single_flight": llm_single_flight.stats(),
+        "llm_gateway": llm_gateway.stats(),
+        "llm_verdict_cache": llm_verdict_cache.stats(),
+        "near_duplicates": near_duplicate_index.stats()
     }
 
 
@@ -336,58 +471,38 @@ async def analyze_message(request: AnalyzeRequest):
         if not request.message or len(request.message.strip()) == 0:
             raise HTTPException(status_code=400, detail="Message cannot be empty")
         
+        # Reject oversized input before any normalization or scanning work
+        if len(request.message) > 10000:
+            raise HTTPException(status_code=400, detail="Message too long")
+        
+        # Normalize, extract and scan the message once, shared by every stage below
+        context = MessageContext(request.message)
+        keyword_hits = context.keyword_hits
+        
         # Check for potential injection attempts
-        suspicious_patterns = ['<script', 'javascript:', 'vbscript:', 'onerror=', 'onload=', 'eval(', 'exec(']
-        message_lower = request.message.lower()
-        if any(pattern in message_lower for pattern in suspicious_patterns):
+        if "suspicious_pattern" in keyword_hits:
             logger.warning(f"Suspicious pattern detected in message: {request.message[:100]}...")
             raise HTTPException(status_code=400, detail="Message contains suspicious content")
         
-        if len(request.message) > 10000:
-            raise HTTPException(status_code=400, detail="Message too long")
-        
         # Log potential security events
-        if any(security_word in message_lower for security_word in ['password', 'pin', 'otp', 'cvv', 'card', 'login', 'verify']):
+        if "security_event" in keyword_hits:
             logger.info(f"Security-sensitive content detected in message")
         
-        message = request.message.strip()
+        message = context.text
         enable_llm = request.enable_llm and is_llm_available()
         language = request.language or "ar"
         
-        # Extract URLs
-        urls = extract_urls(message)
-        logger.info(f"Found {len(urls)} URLs: {urls}")
+        urls = context.urls
+        logger.info(f"Found {len(urls)} URLs: {urls} (message language: {context.language})")
         
-        # Analyze URLs with ML
-        url_predictions = []
-        total_prob = 0.0
-        
-        for url in urls:
-            try:
-                pred = predict_url(url)
-                url_predictions.append(pred)
-                total_prob += pred.probability
-            except Exception as e:
-                logger.error(f"Error predicting URL {url}: {e}")
-                url_predictions.append(URLPrediction(
-                    url=url,
-                    prediction=0,
-                    probability=0.5,
-                    features={}
-                ))
-                total_prob += 0.5
-        
-        # ML risk score
-        ml_risk_score = round(
-            (total_prob / len(url_predictions) * 100) if url_predictions else 0.0,
-            2
-        )
+        # Analyze URLs with ML (one batched model call)
+        url_predictions, ml_risk_score = await score_urls(urls)
         
-        # LLM analysis
+        # LLM analysis (skipped when a link is already confirmed as phishing)
         llm_analysis = None
-        if enable_llm:
+        if enable_llm and not any(pred.is_blocklisted for pred in url_predictions):
             try:
-                llm_analysis = await analyze_message_with_llm(message, urls)
+                llm_analysis = await analyze_message_with_llm(context)
             except Exception as e:
                 logger.error(f"LLM analysis failed: {e}")
         
@@ -455,9 +570,7 @@ async def report_message(request: dict):
         message = message.strip()[:10000]  # Limit length
         
         # Check for suspicious content in the report itself
-        suspicious_patterns = ['<script', 'javascript:', 'vbscript:', 'onerror=', 'onload=', 'eval(', 'exec(']
-        message_lower = message.lower()
-        if any(pattern in message_lower for pattern in suspicious_patterns):
+        if "suspicious_pattern" in scan_keywords(message):
             logger.warning(f"Suspicious pattern detected in report: {message[:100]}...")
             raise HTTPException(status_code=400, detail="Report contains suspicious content")
         
@@ -494,54 +607,34 @@ async def scan_sms(request: AnalyzeRequest):
         if not request.message or len(request.message.strip()) == 0:
             raise HTTPException(status_code=400, detail="SMS message cannot be empty")
         
+        # Reject oversized input before any normalization or scanning work
+        if len(request.message) > 10000:
+            raise HTTPException(status_code=400, detail="Message too long")
+        
+        # Normalize, extract and scan the message once, shared by every stage below
+        context = MessageContext(request.message)
+        keyword_hits = context.keyword_hits
+        
         # Check for potential injection attempts
-        suspicious_patterns = ['<script', 'javascript:', 'vbscript:', 'onerror=', 'onload=', 'eval(', 'exec(']
-        message_lower = request.message.lower()
-        if any(pattern in message_lower for pattern in suspicious_patterns):
+        if "suspicious_pattern" in keyword_hits:
             logger.warning(f"Suspicious pattern detected in SMS: {request.message[:100]}...")
             raise HTTPException(status_code=400, detail="Message contains suspicious content")
         
-        if len(request.message) > 10000:
-            raise HTTPException(status_code=400, detail="Message too long")
-        
-        message = request.message.strip()
+        message = context.text
         enable_llm = request.enable_llm and is_llm_available()
         language = request.language or "ar"
         
-        # Extract URLs
-        urls = extract_urls(message)
-        logger.info(f"Found {len(urls)} URLs in SMS: {urls}")
-        
-        # Analyze URLs with ML
-        url_predictions = []
-        total_prob = 0.0
+        urls = context.urls
+        logger.info(f"Found {len(urls)} URLs in SMS: {urls} (message language: {context.language})")
         
-        for url in urls:
-            try:
-                pred = predict_url(url)
-                url_predictions.append(pred)
-                total_prob += pred.probability
-            except Exception as e:
-                logger.error(f"Error predicting URL {url}: {e}")
-                url_predictions.append(URLPrediction(
-                    url=url,
-                    prediction=0,
-                    probability=0.5,
-                    features={}
-                ))
-                total_prob += 0.5
-        
-        # ML risk score
-        ml_risk_score = round(
-            (total_prob / len(url_predictions) * 100) if url_predictions else 0.0,
-            2
-        )
+        # Analyze URLs with ML (one batched model call)
+        url_predictions, ml_risk_score = await score_urls(urls)
         
-        # LLM analysis
+        # LLM analysis (skipped when a link is already confirmed as phishing)
         llm_analysis = None
-        if enable_llm:
+        if enable_llm and not any(pred.is_blocklisted for pred in url_predictions):
             try:
-                llm_analysis = await analyze_message_with_llm(message, urls)
+                llm_analysis = await analyze_message_with_llm(context)
             except Exception as e:
                 logger.error(f"LLM analysis failed: {e}")
         
@@ -0,0 +1,272 @@
+"""
+========================================
+Tanabbah - Inference Batching Module
+========================================
+Purpose: Micro-batch URL scoring across concurrent requests
+Author: Manal Alyami
+Version: 1.2.0 - Tracked Batch Tasks
+========================================
+"""
+
+import os
+import time
+import asyncio
+import threading
+import multiprocessing
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence, Set
+
+from .ml import URLPrediction, load_model, is_model_loaded, get_url_cache_stats
+from .singleflight import SingleFlight
+
+# Configuration
+BATCH_WINDOW_MS = float(os.getenv("INFERENCE_BATCH_WINDOW_MS", "2"))
+MAX_BATCH_SIZE = int(os.getenv("INFERENCE_MAX_BATCH_SIZE", "64"))
+ML_EXECUTOR = os.getenv("ML_EXECUTOR", "thread").lower()  # inline | thread | process
+ML_EXECUTOR_WORKERS = int(os.getenv("ML_EXECUTOR_WORKERS", "2"))
+SHUTDOWN_GRACE_SECONDS = 5.0  # time given to running batches before they are cancelled
+EXECUTOR_MODES = ("inline", "thread", "process")
+
+URL_CACHE_COUNTERS = ("entries", "hits", "misses", "evictions", "expirations", "invalidations")
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+QUEUE_WAIT_BUCKETS_MS = (0.5, 1, 2, 5, 10, 25, 50, 100, 250, 1000)
+
+
+class Histogram:
+    """Fixed-bucket histogram with cumulative (Prometheus-style) bucket counts"""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self._count = 0
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self._counts[i] += 1
+                    break
+            else:
+                self._counts[-1] += 1
+            self._count += 1
+            self._sum += value
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            cumulative = {}
+            running = 0
+            for bound, count in zip(self.buckets, self._counts):
+                running += count
+                cumulative[f"le_{bound:g}"] = running
+            cumulative["le_inf"] = running + self._counts[-1]
+            return {
+                "count": self._count,
+                "sum": round(self._sum, 4),
+                "mean": round(self._sum / self._count, 4) if self._count else 0.0,
+                "buckets": cumulative
+            }
+
+
+# === ML EXECUTORS ===
+
+def _init_ml_process() -> None:
+    """Process pool initializer: load the model once per worker process"""
+    load_model()
+
+
+def _predict_and_report(predict_fn: Callable[[List[str]], List[URLPrediction]], urls: List[str]) -> tuple:
+    """Process pool task: score a batch and report this worker's URL cache counters with it"""
+    return predict_fn(urls), os.getpid(), get_url_cache_stats()
+
+
+def create_ml_executor(mode: str = ML_EXECUTOR, workers: int = ML_EXECUTOR_WORKERS) -> Optional[Executor]:
+    """
+    Executor for the ML stage
+    - inline: run on the event loop (no executor)
+    - thread: thread pool in this process, sharing the loaded model and URL cache
+    - process: spawned worker processes, each with its own model and URL cache
+    """
+    if mode not in EXECUTOR_MODES:
+        raise ValueError(f"Unknown ML_EXECUTOR '{mode}', expected one of {EXECUTOR_MODES}")
+    workers = max(workers, 1)
+
+    if mode == "thread":
+        return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ml")
+    if mode == "process":
+        # spawn, not fork: the parent may already hold threads and locks
+        return ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_ml_process
+        )
+    return None
+
+
+class InferenceBatcher:
+    """
+    Collects URL scoring requests from all in-flight coroutines and scores them
+    together: a batch is flushed when the window expires or max_batch_size is
+    reached, and every caller's future resolves with its own URLPrediction.
+    A URL that is already queued or being scored joins that request instead of
+    being scored twice
+
+    Batch tasks are kept in _tasks until they finish (the loop only holds weak
+    references to tasks), so shutdown() can drain or cancel them
+    """
+
+    def __init__(self, predict_fn: Callable[[List[str]], List[URLPrediction]],
+                 window_ms: float = BATCH_WINDOW_MS, max_batch_size: int = MAX_BATCH_SIZE):
+        self.predict_fn = predict_fn
+        self.executor: Optional[Executor] = None
+        self.executor_mode = "inline"
+        self.executor_workers = 0
+        self.window_seconds = max(window_ms, 0.0) / 1000.0
+        self.max_batch_size = max(max_batch_size, 1)
+        self._pending: List[tuple] = []  # (url, future, enqueued_at)
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()  # running batches
+        self._worker_cache_stats: Dict[int, Dict] = {}  # pid -> URL cache stats (process mode)
+        self.flights = SingleFlight("url_scoring")
+        self.batches = 0
+        self.urls_scored = 0
+        self.batch_sizes = Histogram(BATCH_SIZE_BUCKETS)
+        self.queue_wait_ms = Histogram(QUEUE_WAIT_BUCKETS_MS)
+
+    def start(self, mode: str = ML_EXECUTOR, workers: int = ML_EXECUTOR_WORKERS) -> None:
+        """Attach the ML executor; call from the running worker, not at import"""
+        self.executor = create_ml_executor(mode, workers)
+        self.executor_mode = mode
+        self.executor_workers = max(workers, 1) if self.executor is not None else 0
+        self._worker_cache_stats = {}
+
+    async def warm_up(self) -> bool:
+        """Start every pool worker up front so the first batch doesn't pay for model loading"""
+        if self.executor is None:
+            return is_model_loaded()
+        loop = asyncio.get_running_loop()
+        ready = await asyncio.gather(*[
+            loop.run_in_executor(self.executor, is_model_loaded) for _ in range(self.executor_workers)
+        ])
+        return all(ready)
+
+    async def shutdown(self, grace_seconds: float = SHUTDOWN_GRACE_SECONDS) -> None:
+        """Score what is queued, give running batches grace_seconds, cancel the rest, stop the executor"""
+        if self._pending:
+            self._flush()
+        if self._tasks:
+            _, unfinished = await asyncio.wait(set(self._tasks), timeout=grace_seconds)
+            for task in unfinished:
+                task.cancel()
+            if unfinished:
+                await asyncio.gather(*unfinished, return_exceptions=True)
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+        self.executor = None
+        self.executor_mode = "inline"
+        self.executor_workers = 0
+
+    async def predict(self, urls: List[str]) -> List[URLPrediction]:
+        """Score URLs as part of the next batch"""
+        if not urls:
+            return []
+        return list(await asyncio.gather(*[
+            self.flights.do(url, lambda url=url: self._enqueue(url)) for url in urls
+        ]))
+
+    def _enqueue(self, url: str) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((url, future, time.perf_counter()))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window_seconds, self._flush)
+        return future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        loop = asyncio.get_running_loop()
+        while self._pending:
+            batch = self._pending[:self.max_batch_size]
+            del self._pending[:self.max_batch_size]
+            task = loop.create_task(self._run_batch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, batch: List[tuple]) -> None:
+        started = time.perf_counter()
+        for _, _, enqueued_at in batch:
+            self.queue_wait_ms.observe((started - enqueued_at) * 1000)
+        self.batch_sizes.observe(len(batch))
+        self.batches += 1
+        self.urls_scored += len(batch)
+
+        try:
+            predictions = await self._execute([url for url, _, _ in batch])
+        except asyncio.CancelledError:
+            for _, future, _ in batch:
+                future.cancel()
+            raise
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future, _), prediction in zip(batch, predictions):
+            if not future.done():
+                future.set_result(prediction)
+
+    async def _execute(self, urls: List[str]) -> List[URLPrediction]:
+        if self.executor is None:
+            return self.predict_fn(urls)
+        loop = asyncio.get_running_loop()
+        if self.executor_mode == "process":
+            predictions, pid, cache_stats = await loop.run_in_executor(
+                self.executor, _predict_and_report, self.predict_fn, urls
+            )
+            self._worker_cache_stats[pid] = cache_stats
+            return predictions
+        return await loop.run_in_executor(self.executor, self.predict_fn, urls)
+
+    def url_cache_stats(self) -> Dict:
+        """
+        URL verdict cache counters from wherever predict_urls runs
+        In process mode each pool worker has its own cache (this process's is
+        unused), so the counters are summed over the workers as of each
+        worker's latest batch
+        """
+        if self.executor_mode != "process":
+            return get_url_cache_stats()
+        reports = list(self._worker_cache_stats.values())
+        totals = {counter: sum(report[counter] for report in reports) for counter in URL_CACHE_COUNTERS}
+        lookups = totals["hits"] + totals["misses"]
+        return {
+            **totals,
+            "hit_rate": round(totals["hits"] / lookups, 4) if lookups else 0.0,
+            "max_entries": reports[0]["max_entries"] if reports else None,  # per worker
+            "ttl_seconds": reports[0]["ttl_seconds"] if reports else None,
+            "workers_reporting": len(reports)
+        }
+
+    def stats(self) -> Dict:
+        return {
+            "executor": self.executor_mode,
+            "executor_workers": self.executor_workers,
+            "window_ms": self.window_seconds * 1000,
+            "max_batch_size": self.max_batch_size,
+            "queued": len(self._pending),
+            "running_batches": len(self._tasks),
+            "batches": self.batches,
+            "urls_scored": self.urls_scored,
+            "single_flight": self.flights.stats(),
+            "batch_size": self.batch_sizes.snapshot(),
+            "queue_wait_ms": self.queue_wait_ms.snapshot()
+        }
@@ -0,0 +1,340 @@
+"""
+========================================
+Tanabbah - Blocklist Module
+========================================
+Purpose: Known-bad URL/domain lookups that short-circuit model work
+Author: Manal Alyami
+Version: 1.0.0 - Bloom Filter + Sorted Digest Store
+========================================
+"""
+
+import os
+import math
+import time
+import hashlib
+import threading
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from .urls import ParsedURL
+
+# Configuration
+BLOCKLIST_PATH = os.getenv("BLOCKLIST_PATH", os.path.join(os.path.dirname(__file__), "data", "blocklist.txt"))
+BLOCKLIST_UPDATES_PATH = os.getenv(
+    "BLOCKLIST_UPDATES_PATH", os.path.join(os.path.dirname(__file__), "data", "blocklist_updates.txt")
+)
+BLOCKLIST_CHECK_INTERVAL = float(os.getenv("BLOCKLIST_CHECK_INTERVAL", "30"))  # seconds between feed checks
+BLOCKLIST_CAPACITY = int(os.getenv("BLOCKLIST_CAPACITY", "1000000"))           # entries the Bloom filter is sized for
+BLOCKLIST_FALSE_POSITIVE_RATE = 0.01
+BLOCKLIST_COMPACT_THRESHOLD = int(os.getenv("BLOCKLIST_COMPACT_THRESHOLD", "50000"))
+DEFAULT_SOURCE = "local"
+
+
+class BlocklistSnapshot(NamedTuple):
+    """Sorted store published as one object, so a lookup never pairs arrays from different loads"""
+    digests: np.ndarray          # sorted uint64 digests
+    digest_sources: np.ndarray   # uint16 source id per digest
+    bloom: "BloomFilter"
+
+
+class BlocklistHit(NamedTuple):
+    entry: str   # the blocked URL or domain that matched
+    source: str  # feed source the entry came from
+
+
+def normalize_entry(text: str) -> str:
+    """Canonical form of a feed entry or URL: lowercase, no scheme, fragment or trailing slash"""
+    entry = text.strip().lower()
+    if '://' in entry:
+        entry = entry.split('://', 1)[1]
+    return entry.split('#', 1)[0].rstrip('/')
+
+
+def entry_digest(entry: str) -> int:
+    """64-bit digest of a normalized entry; the store keeps digests, not strings"""
+    return int.from_bytes(hashlib.blake2b(entry.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def lookup_keys(parsed: ParsedURL) -> List[str]:
+    """Entries that would block a URL: the URL itself, its host and parent domains"""
+    keys = [normalize_entry(parsed.url)]
+    labels = parsed.labels
+    stop = len(labels) - parsed.registrable_domain.count('.')
+    for i in range(stop):
+        keys.append('.'.join(labels[i:]))
+    return keys
+
+
+class BloomFilter:
+    """Bit array with k probes from one 64-bit digest (double hashing)"""
+
+    def __init__(self, capacity: int, false_positive_rate: float = BLOCKLIST_FALSE_POSITIVE_RATE):
+        capacity = max(capacity, 1)
+        self.size = max(64, int(-capacity * math.log(false_positive_rate) / math.log(2) ** 2))
+        self.probes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = np.zeros((self.size + 7) // 8, dtype=np.uint8)
+
+    def _positions(self, digests: np.ndarray) -> np.ndarray:
+        low = digests & np.uint64(0xFFFFFFFF)
+        high = (digests >> np.uint64(32)) | np.uint64(1)
+        steps = np.arange(self.probes, dtype=np.uint64)
+        return (low[:, None] + steps[None, :] * high[:, None]) % np.uint64(self.size)
+
+    def add_many(self, digests: np.ndarray) -> None:
+        if len(digests):
+            positions = self._positions(digests).ravel()
+            np.bitwise_or.at(self.bits, positions >> np.uint64(3), np.left_shift(1, positions & np.uint64(7)).astype(np.uint8))
+
+    def __contains__(self, digest: int) -> bool:
+        low, high = digest & 0xFFFFFFFF, (digest >> 32) | 1
+        bits, size = self.bits, self.size
+        for i in range(self.probes):
+            position = (low + i * high) % size
+            if not bits[position >> 3] >> (position & 7) & 1:
+                return False
+        return True
+
+    @property
+    def nbytes(self) -> int:
+        return self.bits.nbytes
+
+
+class Blocklist:
+    """
+    Known-bad URLs and domains from a local feed
+    Lookups go through a Bloom filter first (almost every URL is a miss), then
+    a binary search over the sorted 64-bit digests of all entries. Feed updates
+    ("+entry" / "-entry" lines appended to the updates file) land in a small
+    overlay that is merged into the sorted store once it grows, so memory stays
+    around 10 bytes per entry (digest, source id, filter bits) whatever the
+    update volume
+    """
+
+    def __init__(self, path: str = BLOCKLIST_PATH, updates_path: str = BLOCKLIST_UPDATES_PATH,
+                 capacity: int = BLOCKLIST_CAPACITY, check_interval: float = BLOCKLIST_CHECK_INTERVAL):
+        self.path = path
+        self.updates_path = updates_path
+        self.capacity = capacity
+        self.check_interval = check_interval
+        self._lock = threading.RLock()
+        self._sources: List[str] = [DEFAULT_SOURCE]
+        self._source_ids: Dict[str, int] = {DEFAULT_SOURCE: 0}
+        self._snapshot = BlocklistSnapshot(
+            np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=np.uint16), BloomFilter(capacity)
+        )
+        self._added: Dict[int, int] = {}  # digest -> source id, not yet merged
+        self._removed: set = set()        # digests removed since the last merge
+        self._updates_offset = 0
+        self._checked_at = time.monotonic()
+        self._feed_signature: Optional[tuple] = None
+        self.lookups = 0
+        self.bloom_rejects = 0
+        self.hits = 0
+        self.updates_applied = 0
+        self.last_error: Optional[str] = None
+
+    # === LOADING ===
+
+    def _source_id(self, source: str) -> int:
+        source_id = self._source_ids.get(source)
+        if source_id is None:
+            source_id = self._source_ids[source] = len(self._sources)
+            self._sources.append(source)
+        return source_id
+
+    @staticmethod
+    def _parse_line(line: str) -> Optional[Tuple[str, str]]:
+        """(entry, source) from a feed line, or None for blanks and comments"""
+        line = line.strip()
+        if not line or line.startswith('#'):
+            return None
+        entry, _, source = line.partition(' ')
+        return normalize_entry(entry), source.strip() or DEFAULT_SOURCE
+
+    def load(self) -> int:
+        """(Re)build the store from the feed file, then replay the updates file"""
+        digests, source_ids = [], []
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                parsed = self._parse_line(line)
+                if parsed and parsed[0]:
+                    digests.append(entry_digest(parsed[0]))
+                    source_ids.append(self._source_id(parsed[1]))
+
+        self._install(np.array(digests, dtype=np.uint64), np.array(source_ids, dtype=np.uint16))
+        self._feed_signature = _file_signature(self.path)
+        self._updates_offset = 0
+        self.apply_updates()
+        return len(self)
+
+    def _install(self, digests: np.ndarray, source_ids: np.ndarray) -> None:
+        """Swap in a new sorted store and a Bloom filter sized for it"""
+        digests, first = np.unique(digests, return_index=True)
+        bloom = BloomFilter(max(self.capacity, 2 * len(digests)))
+        bloom.add_many(digests)
+        with self._lock:
+            self._snapshot = BlocklistSnapshot(digests, source_ids[first], bloom)
+            self._added, self._removed = {}, set()
+
+    def apply_updates(self) -> int:
+        """Apply lines appended to the updates file since the last call"""
+        try:
+            size = os.path.getsize(self.updates_path)
+        except OSError:
+            return 0
+        if size < self._updates_offset:
+            self._updates_offset = 0  # file was rotated
+
+        applied = 0
+        with open(self.updates_path, 'rb') as f:
+            f.seek(self._updates_offset)
+            data = f.read()
+        complete, _, _ = data.rpartition(b'\n')  # a partially written last line waits for the next check
+        if not complete:
+            return 0
+        self._updates_offset += len(complete) + 1
+
+        for raw in complete.decode('utf-8', errors='replace').splitlines():
+            raw = raw.strip()
+            if raw[:1] not in ('+', '-'):
+                continue
+            parsed = self._parse_line(raw[1:])
+            if not parsed or not parsed[0]:
+                continue
+            if raw[0] == '+':
+                self.add(*parsed)
+            else:
+                self.remove(parsed[0])
+            applied += 1
+
+        self.updates_applied += applied
+        self._maybe_compact()
+        return applied
+
+    def add(self, entry: str, source: str = DEFAULT_SOURCE) -> None:
+        digest = entry_digest(normalize_entry(entry))
+        with self._lock:
+            self._removed.discard(digest)
+            self._added[digest] = self._source_id(source)
+            self._snapshot.bloom.add_many(np.array([digest], dtype=np.uint64))
+
+    def remove(self, entry: str) -> None:
+        digest = entry_digest(normalize_entry(entry))
+        with self._lock:
+            self._added.pop(digest, None)
+            self._removed.add(digest)
+
+    def _maybe_compact(self) -> None:
+        if len(self._added) + len(self._removed) >= BLOCKLIST_COMPACT_THRESHOLD:
+            self.compact()
+
+    def compact(self) -> None:
+        """Merge the update overlay into the sorted store (removals also leave the Bloom filter)"""
+        with self._lock:
+            store = self._snapshot
+            added, dropped = self._added, self._removed | set(self._added)
+            keep = ~np.isin(store.digests, np.fromiter(dropped, dtype=np.uint64, count=len(dropped)))
+            merged = np.concatenate([store.digests[keep], np.fromiter(added.keys(), dtype=np.uint64, count=len(added))])
+            merged_sources = np.concatenate([
+                store.digest_sources[keep], np.fromiter(added.values(), dtype=np.uint16, count=len(added))
+            ])
+            self._install(merged, merged_sources)
+
+    def update_due(self) -> bool:
+        """Claim the next feed check if check_interval has passed (one caller per interval gets True)"""
+        with self._lock:
+            now = time.monotonic()
+            if now - self._checked_at < self.check_interval:
+                return False
+            self._checked_at = now
+            return True
+
+    def refresh(self) -> None:
+        """Reload a changed feed or apply new update lines (file I/O; run off the event loop)"""
+        try:
+            if _file_signature(self.path) != self._feed_signature:
+                self.load()
+            else:
+                self.apply_updates()
+            self.last_error = None
+        except (OSError, ValueError) as e:
+            self.last_error = str(e)
+            print(f"⚠️ Blocklist update failed, keeping current entries: {e}")
+
+    def check_for_updates(self) -> None:
+        """Refresh if due (checked at most every check_interval seconds)"""
+        if self.update_due():
+            self.refresh()
+
+    # === LOOKUPS ===
+
+    def _lookup_digest(self, digest: int) -> Optional[str]:
+        if digest in self._removed:
+            return None
+        source_id = self._added.get(digest)
+        if source_id is not None:
+            return self._sources[source_id]
+        store = self._snapshot
+        if digest not in store.bloom:
+            self.bloom_rejects += 1
+            return None
+        index = int(np.searchsorted(store.digests, np.uint64(digest)))
+        if index < len(store.digests) and int(store.digests[index]) == digest:
+            return self._sources[int(store.digest_sources[index])]
+        return None
+
+    def match(self, parsed: ParsedURL) -> Optional[BlocklistHit]:
+        """Blocklist entry covering this URL (exact URL first, then host and parent domains)"""
+        self.lookups += 1
+        for key in lookup_keys(parsed):
+            source = self._lookup_digest(entry_digest(key))
+            if source is not None:
+                self.hits += 1
+                return BlocklistHit(key, source)
+        return None
+
+    def __len__(self) -> int:
+        """Entries after the overlay: re-added store entries count once, removed ones not at all"""
+        with self._lock:
+            store, added, removed = self._snapshot.digests, list(self._added), list(self._removed)
+        in_store_added = int(np.isin(np.array(added, dtype=np.uint64), store).sum()) if added else 0
+        in_store_removed = int(np.isin(np.array(removed, dtype=np.uint64), store).sum()) if removed else 0
+        return len(store) - in_store_removed + len(added) - in_store_added
+
+    def stats(self) -> Dict:
+        return {
+            "entries": len(self),
+            "pending_updates": len(self._added) + len(self._removed),
+            "updates_applied": self.updates_applied,
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "bloom_rejects": self.bloom_rejects,
+            "bloom_bytes": self._snapshot.bloom.nbytes,
+            "store_bytes": self._snapshot.digests.nbytes + self._snapshot.digest_sources.nbytes,
+            "sources": self._sources,
+            "last_error": self.last_error
+        }
+
+
+def _file_signature(path: str) -> Optional[tuple]:
+    try:
+        stat = os.stat(path)
+        return (stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        return None
+
+
+def _load_blocklist() -> Blocklist:
+    blocklist = Blocklist()
+    try:
+        blocklist.load()
+        print(f"⛔ Loaded {len(blocklist)} blocklist entries from {BLOCKLIST_PATH}")
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Could not load blocklist from {BLOCKLIST_PATH}: {e}")
+        blocklist.last_error = str(e)
+    return blocklist
+
+
+# Shared blocklist, loaded at import
+blocklist = _load_blocklist()
@@ -0,0 +1,106 @@
+"""
+========================================
+Tanabbah - Circuit Breaker Module
+========================================
+Purpose: Stop calling a failing or slow dependency and retry it after a cooldown
+Author: Manal Alyami
+Version: 1.0.0 - Consecutive Failure Breaker
+========================================
+"""
+
+import time
+import threading
+from typing import Dict, Optional
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Classic three-state breaker
+    - closed: calls go through; failure_threshold consecutive failures (errors,
+      timeouts or calls slower than slow_call_seconds) open it
+    - open: calls are refused until cooldown_seconds have passed
+    - half_open: one probe call is let through; success closes the breaker,
+      failure opens it for another cooldown
+    """
+
+    def __init__(self, failure_threshold: int, slow_call_seconds: float, cooldown_seconds: float):
+        self.failure_threshold = max(failure_threshold, 1)
+        self.slow_call_seconds = slow_call_seconds
+        self.cooldown_seconds = cooldown_seconds
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.consecutive_failures = 0
+        self.times_opened = 0
+        self.last_failure: Optional[str] = None
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        """State with the open -> half_open transition applied (caller holds _lock)"""
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.cooldown_seconds:
+            self._state = HALF_OPEN
+            self._probe_in_flight = False
+        return self._state
+
+    def allow(self) -> bool:
+        """Whether a call may go through now (in half_open, only the single probe)"""
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def release(self) -> None:
+        """A call allowed through ended without reaching the dependency; free the half_open probe"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record(self, duration: float, error: Optional[str] = None) -> None:
+        """Report a finished call; slow successes count as failures"""
+        if error is None and duration > self.slow_call_seconds:
+            error = f"slow call ({duration:.1f}s)"
+        with self._lock:
+            state = self._current_state()
+            if error is None:
+                self.consecutive_failures = 0
+                self._state = CLOSED
+                self._probe_in_flight = False
+                return
+            self.consecutive_failures += 1
+            self.last_failure = error
+            if state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                self._trip()
+
+    def _trip(self) -> None:
+        if self._state != OPEN:
+            self.times_opened += 1
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._probe_in_flight = False
+
+    def stats(self) -> Dict:
+        with self._lock:
+            state = self._current_state()
+            retry_in = self.cooldown_seconds - (time.monotonic() - self._opened_at) if state == OPEN else 0.0
+            return {
+                "state": state,
+                "consecutive_failures": self.consecutive_failures,
+                "failure_threshold": self.failure_threshold,
+                "slow_call_seconds": self.slow_call_seconds,
+                "cooldown_seconds": self.cooldown_seconds,
+                "retry_in_seconds": round(max(retry_in, 0.0), 1),
+                "times_opened": self.times_opened,
+                "last_failure": self.last_failure
+            }
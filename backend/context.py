@@ -0,0 +1,85 @@
+"""
+========================================
+Tanabbah - Message Context Module
+========================================
+Purpose: Normalize and scan a message once per request and share the result
+Author: Manal Alyami
+Version: 1.0.0 - Per-Request Message Context
+========================================
+"""
+
+import re
+from typing import List
+
+from .keywords import KeywordHits, KEYWORD_INDEX
+from .ml import extract_urls
+from .urls import ParsedURL, parse_url
+
+# === ARABIC NORMALIZATION ===
+# Diacritics (tashkeel), superscript alef and tatweel carry no meaning for matching
+ARABIC_DIACRITICS = re.compile(r'[\u0610-\u061A\u064B-\u065F\u0670\u06D6-\u06ED\u0640]')
+ARABIC_LETTER_MAP = str.maketrans({
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',  # alef variants
+    'ى': 'ي',                                  # alef maqsura
+    'ة': 'ه',                                  # taa marbuta
+    'ؤ': 'و', 'ئ': 'ي',                        # hamza carriers
+})
+ARABIC_LETTERS = re.compile(r'[\u0621-\u064A]')
+LATIN_LETTERS = re.compile(r'[A-Za-z]')
+
+
+def normalize_arabic(text: str) -> str:
+    """Strip diacritics/tatweel and unify letter variants (أإآ -> ا, ى -> ي, ة -> ه)"""
+    return ARABIC_DIACRITICS.sub('', text).translate(ARABIC_LETTER_MAP)
+
+
+def guess_language(text: str) -> str:
+    """'ar', 'en', 'mixed' or 'unknown' from the share of Arabic vs Latin letters"""
+    arabic = len(ARABIC_LETTERS.findall(text))
+    latin = len(LATIN_LETTERS.findall(text))
+    if not arabic and not latin:
+        return "unknown"
+    if arabic >= latin * 4:
+        return "ar"
+    if latin >= arabic * 4:
+        return "en"
+    return "mixed"
+
+
+class MessageContext:
+    """
+    Everything derived from one message, computed once at the start of a request
+    - text: stripped message; lower: its lowercase form (keyword/signature matching)
+    - normalized: Arabic-normalized lowercase form
+    - language: detected message language
+    - urls / parsed_urls: extracted URLs and their shared ParsedURL objects
+    - keyword_hits: every keyword category found in `lower`
+    """
+
+    __slots__ = ('text', 'lower', 'normalized', 'language', 'urls', 'parsed_urls', 'keyword_hits')
+
+    def __init__(self, message: str):
+        self.text = message.strip()
+        self.lower = self.text.lower()
+        self.normalized = normalize_arabic(self.lower)
+        self.urls: List[str] = extract_urls(self.text)
+        self.parsed_urls: List[ParsedURL] = [parse_url(url) for url in self.urls]
+        self.language = guess_language(self._prose())
+        self.keyword_hits: KeywordHits = KEYWORD_INDEX.scan(self.lower)
+
+    def _prose(self) -> str:
+        """Message text without its URLs, so Latin links don't skew the language guess"""
+        prose = self.text
+        for url in self.urls:
+            prose = prose.replace(url, ' ')
+        return prose
+
+    @property
+    def all_urls_trusted(self) -> bool:
+        """True when there is at least one URL and every URL is on the allow-list"""
+        return bool(self.parsed_urls) and all(parsed.is_trusted for parsed in self.parsed_urls)
+
+    def __repr__(self) -> str:
+        return (f"MessageContext(length={len(self.text)}, language={self.language!r}, "
+                f"urls={len(self.urls)}, keywords={sorted(self.keyword_hits.categories)})")
+
@@ -0,0 +1,385 @@
+"""
+========================================
+Tanabbah - Flat Forest Inference Module
+========================================
+Purpose: Array-backed RandomForest evaluation without sklearn
+Author: Manal Alyami
+Version: 1.0.0 - Vectorized Level-by-Level Traversal
+========================================
+"""
+
+import os
+import json
+import struct
+import shutil
+import tempfile
+from typing import List, Optional
+
+import numpy as np
+
+# On-disk array layout (one uncompressed .npy per array + meta.json)
+ARRAYS_FORMAT_VERSION = 1
+ARRAY_NAMES = ('feature', 'threshold', 'left', 'right', 'value', 'roots')
+
+# Compact single-file format: magic, uint32 header length, JSON header, then
+# 64-byte aligned raw arrays. Only split nodes carry feature / threshold /
+# children; leaves are a separate array holding one quantized class-1 fraction
+# (the model is binary). A child reference >= 0 is a split node, < 0 is leaf ~ref
+COMPACT_MAGIC = b'TNBF'
+COMPACT_FORMAT_VERSION = 2
+COMPACT_VALUE_SCALE = 65535
+COMPACT_ALIGNMENT = 64
+COMPACT_ARRAY_NAMES = ('feature', 'threshold', 'left', 'right', 'leaf_value', 'roots')
+COMPACT_DTYPES = {
+    'feature': np.uint8,
+    'threshold': np.float32,
+    'left': np.int32,
+    'right': np.int32,
+    'leaf_value': np.uint16,
+    'roots': np.int32,
+}
+
+
+def _swap_in(staging: str, directory: str) -> Optional[str]:
+    """
+    Point `directory` at `staging` and return the directory it replaced
+    A symlink is replaced atomically; a plain directory from an older save is
+    renamed aside first. Platforms without symlinks fall back to renames
+    """
+    link = f"{staging}.link"
+    try:
+        os.symlink(os.path.basename(staging), link)
+    except (OSError, NotImplementedError):
+        link = None
+
+    previous = None
+    if os.path.islink(directory):
+        previous = os.path.join(os.path.dirname(directory), os.readlink(directory))
+    elif os.path.exists(directory):
+        previous = f"{staging}.old"
+        os.rename(directory, previous)
+
+    try:
+        if link is not None:
+            os.replace(link, directory)
+        else:
+            if os.path.islink(directory):
+                os.unlink(directory)
+            os.rename(staging, directory)
+    except OSError:
+        if link is not None and os.path.lexists(link):
+            os.unlink(link)
+        if previous and previous.endswith('.old') and not os.path.lexists(directory):
+            os.rename(previous, directory)
+        raise
+    return previous
+
+
+class FlatForest:
+    """
+    RandomForest exported into flat node arrays
+    All trees share one node table; leaves point to themselves so a batch can
+    be walked level by level with plain NumPy indexing
+    """
+
+    def __init__(self, feature, threshold, left, right, value, roots,
+                 max_depth: int, classes, n_features_in: int):
+        self.feature = feature        # (n_nodes,) feature index per node (0 for leaves)
+        self.threshold = threshold    # (n_nodes,) split threshold per node
+        self.left = left              # (n_nodes,) left child, self for leaves
+        self.right = right            # (n_nodes,) right child, self for leaves
+        self.value = value            # (n_nodes, n_classes) class fractions per node
+        self.roots = roots            # (n_trees,) root node of each tree
+        self.max_depth = int(max_depth)
+        self.classes_ = np.asarray(classes)
+        self.n_features_in_ = int(n_features_in)
+
+    @property
+    def n_estimators(self) -> int:
+        return len(self.roots)
+
+    @property
+    def node_count(self) -> int:
+        return len(self.feature)
+
+    @classmethod
+    def from_sklearn(cls, model) -> "FlatForest":
+        """Export a fitted sklearn RandomForestClassifier"""
+        features: List[np.ndarray] = []
+        thresholds: List[np.ndarray] = []
+        lefts: List[np.ndarray] = []
+        rights: List[np.ndarray] = []
+        values: List[np.ndarray] = []
+        roots = []
+        max_depth = 0
+        offset = 0
+
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            count = tree.node_count
+            node_ids = np.arange(offset, offset + count, dtype=np.int64)
+            is_leaf = tree.children_left == -1
+
+            features.append(np.where(is_leaf, 0, tree.feature).astype(np.int32))
+            thresholds.append(tree.threshold.astype(np.float64))
+            lefts.append(np.where(is_leaf, node_ids, tree.children_left + offset).astype(np.int32))
+            rights.append(np.where(is_leaf, node_ids, tree.children_right + offset).astype(np.int32))
+            values.append(tree.value[:, 0, :].astype(np.float64))
+
+            roots.append(offset)
+            max_depth = max(max_depth, tree.max_depth)
+            offset += count
+
+        return cls(
+            feature=np.concatenate(features),
+            threshold=np.concatenate(thresholds),
+            left=np.concatenate(lefts),
+            right=np.concatenate(rights),
+            value=np.concatenate(values),
+            roots=np.asarray(roots, dtype=np.int64),
+            max_depth=max_depth,
+            classes=model.classes_,
+            n_features_in=model.n_features_in_,
+        )
+
+    def save(self, directory: str) -> None:
+        """
+        Write the node arrays as uncompressed .npy files
+        Each save goes to a new versioned directory next to the target, and
+        `directory` is a symlink switched to it with one atomic rename, so
+        workers see either the old arrays or the new ones, never a mix
+        """
+        directory = os.path.abspath(directory)
+        parent = os.path.dirname(directory)
+        base = os.path.basename(directory)
+        staging = tempfile.mkdtemp(prefix=f'.{base}-', dir=parent)
+        try:
+            for name in ARRAY_NAMES:
+                np.save(os.path.join(staging, f'{name}.npy'), np.ascontiguousarray(getattr(self, name)))
+            meta = {
+                "format_version": ARRAYS_FORMAT_VERSION,
+                "max_depth": self.max_depth,
+                "classes": self.classes_.tolist(),
+                "n_features_in": self.n_features_in_,
+                "node_count": self.node_count,
+            }
+            with open(os.path.join(staging, 'meta.json'), 'w') as f:
+                json.dump(meta, f, indent=2)
+            os.chmod(staging, 0o755)
+            previous = _swap_in(staging, directory)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        # Workers still mapping the old files keep their pages until they reload
+        if previous and previous != staging:
+            shutil.rmtree(previous, ignore_errors=True)
+
+    @classmethod
+    def load(cls, directory: str, mmap_mode: Optional[str] = 'r') -> "FlatForest":
+        """
+        Open arrays written by save()
+        With mmap_mode='r' every process maps the same files, so workers share
+        one set of physical pages through the OS page cache
+        """
+        with open(os.path.join(directory, 'meta.json')) as f:
+            meta = json.load(f)
+        if meta.get("format_version") != ARRAYS_FORMAT_VERSION:
+            raise ValueError(f"Unsupported forest array format: {meta.get('format_version')}")
+
+        arrays = {
+            name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode=mmap_mode)
+            for name in ARRAY_NAMES
+        }
+        return cls(
+            max_depth=meta["max_depth"],
+            classes=meta["classes"],
+            n_features_in=meta["n_features_in"],
+            **arrays
+        )
+
+    def save_compact(self, path: str) -> None:
+        """
+        Write the versioned compact format (see CompactForest)
+        Thresholds are rounded down to float32: for float32 inputs x <= t32
+        gives the same split as x <= t, so only leaf quantization adds drift
+        """
+        if self.n_features_in_ > 256:
+            raise ValueError("Compact format stores feature ids as uint8 (max 256 features)")
+        if len(self.classes_) != 2:
+            raise ValueError("Compact format stores one class fraction per leaf (binary models only)")
+
+        left = np.asarray(self.left)
+        is_leaf = left == np.arange(self.node_count)
+        # Old node id -> compact reference: split nodes count up from 0, leaves are ~leaf index
+        split_ids = np.flatnonzero(~is_leaf)
+        leaf_ids = np.flatnonzero(is_leaf)
+        refs = np.empty(self.node_count, dtype=np.int64)
+        refs[split_ids] = np.arange(len(split_ids))
+        refs[leaf_ids] = ~np.arange(len(leaf_ids))
+
+        threshold = np.asarray(self.threshold)[split_ids]
+        threshold32 = threshold.astype(np.float32)
+        rounded_up = threshold32.astype(np.float64) > threshold
+        threshold32[rounded_up] = np.nextafter(threshold32[rounded_up], np.float32(-np.inf))
+
+        leaf_value = np.asarray(self.value, dtype=np.float64)[leaf_ids]
+        positive = leaf_value[:, 1] / leaf_value.sum(axis=1)
+
+        arrays = {
+            'feature': np.asarray(self.feature)[split_ids].astype(np.uint8),
+            'threshold': threshold32,
+            'left': refs[left[split_ids]].astype(np.int32),
+            'right': refs[np.asarray(self.right)[split_ids]].astype(np.int32),
+            'leaf_value': np.rint(positive * COMPACT_VALUE_SCALE).astype(np.uint16),
+            'roots': refs[np.asarray(self.roots)].astype(np.int32),
+        }
+
+        # Lay out the arrays after the header, each on an aligned offset
+        table = {}
+        offset = 0
+        for name in COMPACT_ARRAY_NAMES:
+            array = np.ascontiguousarray(arrays[name])
+            table[name] = {"offset": offset, "shape": list(array.shape)}
+            offset += -(-array.nbytes // COMPACT_ALIGNMENT) * COMPACT_ALIGNMENT
+
+        header = json.dumps({
+            "format_version": COMPACT_FORMAT_VERSION,
+            "max_depth": self.max_depth,
+            "classes": self.classes_.tolist(),
+            "n_features_in": self.n_features_in_,
+            "value_scale": COMPACT_VALUE_SCALE,
+            "arrays": table,
+        }).encode('utf-8')
+        data_start = -(-(len(COMPACT_MAGIC) + 4 + len(header)) // COMPACT_ALIGNMENT) * COMPACT_ALIGNMENT
+
+        staging = f"{path}.tmp-{os.getpid()}"
+        with open(staging, 'wb') as f:
+            f.write(COMPACT_MAGIC)
+            f.write(struct.pack('<I', len(header)))
+            f.write(header)
+            for name in COMPACT_ARRAY_NAMES:
+                f.seek(data_start + table[name]["offset"])
+                f.write(np.ascontiguousarray(arrays[name]).tobytes())
+        os.replace(staging, path)
+
+    def apply(self, X) -> np.ndarray:
+        """Leaf node reached by every sample in every tree, shape (n_samples, n_trees)"""
+        # sklearn compares float32 inputs against float64 thresholds
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"Expected input of shape (n, {self.n_features_in_}), got {X.shape}")
+
+        n_samples, n_trees = X.shape[0], len(self.roots)
+        nodes = np.tile(self.roots, n_samples)
+        samples = np.repeat(np.arange(n_samples), n_trees)
+
+        # Walk one level per step, keeping only (sample, tree) pairs not yet at a leaf
+        active = np.arange(nodes.size)
+        for _ in range(self.max_depth):
+            if active.size == 0:
+                break
+            current = nodes[active]
+            go_left = X[samples[active], self.feature[current]] <= self.threshold[current]
+            reached = np.where(go_left, self.left[current], self.right[current])
+            nodes[active] = reached
+            active = active[self.left[reached] != reached]
+
+        return nodes.reshape(n_samples, n_trees)
+
+    def predict_proba(self, X) -> np.ndarray:
+        """Mean class probabilities over all trees, same as RandomForestClassifier"""
+        leaves = self.apply(X)
+        # Cumulative sum keeps sklearn's tree-by-tree accumulation order
+        totals = np.cumsum(self.value[leaves], axis=1)[:, -1, :]
+        return totals / self.n_estimators
+
+    def predict(self, X) -> np.ndarray:
+        """Class labels from the probabilities (no second traversal)"""
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+
+class CompactForest:
+    """
+    Binary forest opened from the compact file written by FlatForest.save_compact
+    Split nodes and leaves live in separate memory-mapped arrays, so the file
+    holds no per-leaf split fields and no per-node class values
+    """
+
+    def __init__(self, feature, threshold, left, right, leaf_value, roots,
+                 max_depth: int, classes, n_features_in: int, value_scale: int):
+        self.feature = feature        # (n_splits,) feature index per split node
+        self.threshold = threshold    # (n_splits,) float32 split threshold
+        self.left = left              # (n_splits,) child reference (>= 0 split, < 0 leaf ~ref)
+        self.right = right            # (n_splits,) child reference
+        self.leaf_value = leaf_value  # (n_leaves,) quantized class-1 fraction
+        self.roots = roots            # (n_trees,) root reference of each tree
+        self.value_scale = int(value_scale)
+        self.max_depth = int(max_depth)
+        self.classes_ = np.asarray(classes)
+        self.n_features_in_ = int(n_features_in)
+
+    @property
+    def n_estimators(self) -> int:
+        return len(self.roots)
+
+    @property
+    def node_count(self) -> int:
+        return len(self.feature) + len(self.leaf_value)
+
+    @classmethod
+    def load(cls, path: str) -> "CompactForest":
+        """Open a compact model file; arrays are memory-mapped views into it"""
+        with open(path, 'rb') as f:
+            if f.read(len(COMPACT_MAGIC)) != COMPACT_MAGIC:
+                raise ValueError(f"{path} is not a compact forest file")
+            (header_length,) = struct.unpack('<I', f.read(4))
+            header = json.loads(f.read(header_length).decode('utf-8'))
+        if header.get("format_version") != COMPACT_FORMAT_VERSION:
+            raise ValueError(f"Unsupported compact forest format: {header.get('format_version')} "
+                             f"(re-run python model_tools.py convert)")
+
+        data_start = -(-(len(COMPACT_MAGIC) + 4 + header_length) // COMPACT_ALIGNMENT) * COMPACT_ALIGNMENT
+        arrays = {}
+        for name in COMPACT_ARRAY_NAMES:
+            entry = header["arrays"][name]
+            arrays[name] = np.memmap(path, dtype=COMPACT_DTYPES[name], mode='r',
+                                     offset=data_start + entry["offset"], shape=tuple(entry["shape"]))
+        return cls(
+            max_depth=header["max_depth"],
+            classes=header["classes"],
+            n_features_in=header["n_features_in"],
+            value_scale=header["value_scale"],
+            **arrays
+        )
+
+    def apply(self, X) -> np.ndarray:
+        """Leaf index reached by every sample in every tree, shape (n_samples, n_trees)"""
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"Expected input of shape (n, {self.n_features_in_}), got {X.shape}")
+
+        n_samples, n_trees = X.shape[0], len(self.roots)
+        refs = np.tile(np.asarray(self.roots, dtype=np.int64), n_samples)
+        samples = np.repeat(np.arange(n_samples), n_trees)
+
+        # Same level-by-level walk as FlatForest; a pair is done once its reference is a leaf
+        active = np.flatnonzero(refs >= 0)
+        for _ in range(self.max_depth):
+            if active.size == 0:
+                break
+            current = refs[active]
+            go_left = X[samples[active], self.feature[current]] <= self.threshold[current]
+            reached = np.where(go_left, self.left[current], self.right[current])
+            refs[active] = reached
+            active = active[reached >= 0]
+
+        return (~refs).reshape(n_samples, n_trees)
+
+    def predict_proba(self, X) -> np.ndarray:
+        """Mean class probabilities over all trees (exact integer sum, scaled once)"""
+        totals = self.leaf_value[self.apply(X)].sum(axis=1, dtype=np.int64)
+        positive = totals / (self.n_estimators * self.value_scale)
+        return np.column_stack([1.0 - positive, positive])
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
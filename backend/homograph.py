@@ -0,0 +1,269 @@
+"""
+========================================
+Tanabbah - Homograph Detection Module
+========================================
+Purpose: Indexed lookalike detection of hosts against protected brand domains
+Author: Manal Alyami
+Version: 1.1.0 - Short-Name and Foreign-TLD Guards
+========================================
+"""
+
+import os
+import unicodedata
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+from .urls import ParsedURL, registrable_domain
+
+# Configuration
+PROTECTED_BRANDS_PATH = os.getenv(
+    "PROTECTED_BRANDS_PATH", os.path.join(os.path.dirname(__file__), "data", "protected_brands.txt")
+)
+HOMOGRAPH_MAX_DISTANCE = int(os.getenv("HOMOGRAPH_MAX_DISTANCE", "2"))
+HOMOGRAPH_CACHE_SIZE = int(os.getenv("HOMOGRAPH_CACHE_SIZE", "8192"))
+MIN_TOKEN_LENGTH = 3
+SHORT_NAME_LENGTH = 5  # shorter skeletons (moi, stc, dhl, gosi) are everyday words as a bare label
+
+# === CONFUSABLE SKELETONS ===
+# Characters that render like a Latin letter (Cyrillic, Greek, digits) map to
+# that letter, so "аbsher" (Cyrillic a), "g00gle" and "paypa1" share a skeleton
+# with the brand they imitate
+CONFUSABLES = str.maketrans({
+    # Cyrillic
+    'а': 'a', 'в': 'b', 'е': 'e', 'к': 'k', 'м': 'm', 'н': 'h', 'о': 'o', 'р': 'p',
+    'с': 'c', 'т': 't', 'у': 'y', 'х': 'x', 'ѕ': 's', 'і': 'l', 'ј': 'j', 'ԁ': 'd',
+    'һ': 'h', 'ӏ': 'l', 'ԛ': 'q', 'ԝ': 'w', 'ь': 'b', 'ɡ': 'g',
+    # Greek
+    'α': 'a', 'β': 'b', 'ε': 'e', 'η': 'n', 'ι': 'l', 'κ': 'k', 'ν': 'v', 'ο': 'o',
+    'ρ': 'p', 'τ': 't', 'υ': 'u', 'χ': 'x', 'ω': 'w',
+    # Digit / letter swaps
+    '0': 'o', '1': 'l', '3': 'e', '4': 'a', '5': 's', '7': 't', '@': 'a', '$': 's',
+    # i, l and | are indistinguishable in many fonts
+    'i': 'l', '|': 'l',
+})
+# Letter pairs that render like one letter ("rn" -> "m")
+CONFUSABLE_SEQUENCES = (('rn', 'm'), ('vv', 'w'), ('cl', 'd'))
+
+
+def decode_punycode(label: str) -> str:
+    """Unicode form of an IDN label ("xn--..."), or the label unchanged"""
+    if label.startswith('xn--'):
+        try:
+            return label.encode('ascii').decode('idna')
+        except (UnicodeError, ValueError):
+            return label
+    return label
+
+
+def skeleton(text: str) -> str:
+    """Confusable skeleton: punycode decoded, accents dropped, lookalikes folded"""
+    text = unicodedata.normalize('NFKD', decode_punycode(text.lower()))
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    text = text.translate(CONFUSABLES)
+    for sequence, replacement in CONFUSABLE_SEQUENCES:
+        text = text.replace(sequence, replacement)
+    return text
+
+
+def edit_distance(a: str, b: str) -> int:
+    """Levenshtein distance"""
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        previous = current
+    return previous[-1]
+
+
+def allowed_distance(name: str) -> int:
+    """Edit budget for a name: short names only match their exact skeleton
+    Applied to both the brand name and the host token, so a short word like
+    "cloud" is never an edit away from a longer brand ("icloud")"""
+    if len(name) <= 5:
+        return 0
+    return min(HOMOGRAPH_MAX_DISTANCE, 1 if len(name) < 10 else 2)
+
+
+class HostToken(NamedTuple):
+    text: str
+    whole_label: bool  # a complete host label, not a hyphen-separated part of one
+
+
+class LookalikeMatch(NamedTuple):
+    brand: str      # protected brand domain
+    distance: int   # edit distance between skeletons (0 = homograph of the brand name)
+
+
+def deletions(word: str, depth: int) -> Set[str]:
+    """The word and every string reachable from it by deleting up to `depth` characters"""
+    variants = {word}
+    frontier = {word}
+    for _ in range(depth):
+        frontier = {variant[:i] + variant[i + 1:] for variant in frontier for i in range(len(variant))}
+        variants |= frontier
+    return variants
+
+
+class BrandIndex:
+    """
+    Protected brand names indexed by skeleton
+    Exact skeleton hits come from a hash lookup. Near misses ("abshar") come
+    from a deletion index: every string reachable by deleting up to k characters
+    from a brand skeleton points back to it, so two words within edit distance k
+    share an entry and a host token is checked against every brand with a few
+    hash lookups instead of a linear scan
+
+    Guards against ordinary hosts:
+    - a registrable domain whose name is a brand's own label under another
+      TLD (google.de, stc.com, moi.fr) is the brand's regional site or an
+      unrelated owner of that word, not a lookalike
+    - a short brand name only counts as part of a hyphenated label
+      (moi-gov.com, stc-pay.net) or with the brand's full domain embedded in
+      the host (moi.gov.sa.verify.com); as a bare label it is too common
+      (mol.com, moj.example.com)
+    """
+
+    def __init__(self, brands: List[Tuple[str, List[str]]] = (), cache_size: int = HOMOGRAPH_CACHE_SIZE):
+        self.brands: List[str] = []
+        self._order: Dict[str, int] = {}
+        self._by_skeleton: Dict[str, List[Tuple[str, str]]] = {}  # skeleton -> [(brand domain, name)]
+        self._own_labels: Set[str] = set()  # registrable-domain labels of the brands ("google", "stc")
+        self._domain_skeletons: Dict[str, str] = {}  # brand domain -> its skeleton
+        self._deletions: Dict[str, Set[str]] = {}  # deletion variant -> brand skeletons
+        self._max_length = 0
+        for domain, names in brands:
+            self.add(domain, names)
+        self._match_host = lru_cache(maxsize=cache_size)(self._lookup)
+
+    @classmethod
+    def from_file(cls, path: str = PROTECTED_BRANDS_PATH) -> "BrandIndex":
+        brands = []
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip() and not line.lstrip().startswith('#'):
+                    domain, *names = line.split()
+                    brands.append((domain, names))
+        return cls(brands)
+
+    def add(self, domain: str, names: List[str] = ()) -> None:
+        domain = domain.strip().lower()
+        if domain in self._order:
+            return
+        self._order[domain] = len(self.brands)
+        self.brands.append(domain)
+        labels = tuple(domain.split('.'))
+        own_label = registrable_domain(labels).split('.')[0]
+        self._own_labels.add(own_label)
+        self._domain_skeletons[domain] = '.'.join(skeleton(label) for label in labels)
+        for name in [own_label, *names]:
+            key = skeleton(name.lower())
+            if len(key) < MIN_TOKEN_LENGTH:
+                continue
+            self._by_skeleton.setdefault(key, []).append((domain, name.lower()))
+            for variant in deletions(key, allowed_distance(name)):
+                self._deletions.setdefault(variant, set()).add(key)
+            self._max_length = max(self._max_length, len(key))
+        if hasattr(self, '_match_host'):
+            self._match_host.cache_clear()
+
+    def is_official(self, host: str) -> bool:
+        """Host is a protected brand's own domain or one of its subdomains"""
+        labels = host.split('.')
+        return any('.'.join(labels[i:]) in self._order for i in range(len(labels)))
+
+    def _lookup(self, host: str, name_labels: Tuple[str, ...]) -> Optional[LookalikeMatch]:
+        if self.is_official(host) or name_labels[-1] in self._own_labels:
+            return None
+        host_skeleton = None
+        best: Optional[Tuple[int, int, str]] = None  # (distance, brand order, brand)
+        for token in host_tokens(name_labels):
+            key = skeleton(token.text)
+            if len(key) < MIN_TOKEN_LENGTH:
+                continue
+            for distance, brand_key in self._candidates(key):
+                for brand, name in self._by_skeleton[brand_key]:
+                    if distance > min(allowed_distance(name), allowed_distance(key)):
+                        continue
+                    if token.whole_label and len(brand_key) < SHORT_NAME_LENGTH:
+                        if host_skeleton is None:
+                            host_skeleton = '.' + '.'.join(skeleton(label) for label in host.split('.')) + '.'
+                        if f".{self._domain_skeletons[brand]}." not in host_skeleton:
+                            continue
+                    candidate = (distance, self._order[brand], brand)
+                    if best is None or candidate < best:
+                        best = candidate
+        return LookalikeMatch(best[2], best[0]) if best else None
+
+    def _candidates(self, key: str) -> List[Tuple[int, str]]:
+        """(distance, brand skeleton) pairs within HOMOGRAPH_MAX_DISTANCE of a token skeleton"""
+        if key in self._by_skeleton:
+            return [(0, key)]  # an exact hit is the closest possible match
+        if len(key) > self._max_length + HOMOGRAPH_MAX_DISTANCE:
+            return []
+        brand_keys = set()
+        for variant in deletions(key, HOMOGRAPH_MAX_DISTANCE):
+            brand_keys.update(self._deletions.get(variant, ()))
+        found = []
+        for brand_key in brand_keys:
+            distance = edit_distance(key, brand_key)
+            if distance <= HOMOGRAPH_MAX_DISTANCE:
+                found.append((distance, brand_key))
+        return found
+
+    def match(self, parsed: ParsedURL) -> Optional[LookalikeMatch]:
+        """Closest protected brand a URL's host imitates, or None"""
+        if parsed.is_trusted or not parsed.labels or all(label.isdigit() for label in parsed.labels):
+            return None
+        suffix_length = parsed.registrable_domain.count('.')
+        name_labels = parsed.labels[:len(parsed.labels) - suffix_length] if suffix_length else parsed.labels
+        return self._match_host(parsed.host, name_labels)
+
+    def __len__(self) -> int:
+        return len(self.brands)
+
+    def stats(self) -> Dict:
+        info = self._match_host.cache_info()
+        lookups = info.hits + info.misses
+        return {
+            "brands": len(self.brands),
+            "skeletons": len(self._by_skeleton),
+            "deletion_variants": len(self._deletions),
+            "cache_size": info.currsize,
+            "cache_hits": info.hits,
+            "cache_misses": info.misses,
+            "cache_hit_rate": round(info.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+def host_tokens(name_labels: Tuple[str, ...]) -> List[HostToken]:
+    """Host labels left of the public suffix, plus their hyphen-separated parts and joined form"""
+    tokens = []
+    for label in name_labels:
+        if label == 'www':
+            continue
+        tokens.append(HostToken(label, True))
+        if '-' in label:
+            tokens.extend(HostToken(part, False) for part in label.split('-') if part)
+            tokens.append(HostToken(label.replace('-', ''), False))
+    return tokens
+
+
+def _load_index() -> BrandIndex:
+    try:
+        index = BrandIndex.from_file(PROTECTED_BRANDS_PATH)
+        print(f"🎭 Loaded {len(index)} protected brands from {PROTECTED_BRANDS_PATH}")
+        return index
+    except OSError as e:
+        print(f"⚠️ Could not load protected brands from {PROTECTED_BRANDS_PATH}: {e}")
+        return BrandIndex()
+
+
+# Shared index, loaded at import
+brand_index = _load_index()
+
+
+def find_lookalike(parsed: ParsedURL) -> Optional[LookalikeMatch]:
+    return brand_index.match(parsed)
@@ -0,0 +1,150 @@
+"""
+========================================
+Tanabbah - Keyword Index Module
+========================================
+Purpose: Single-pass keyword matching for every message and URL keyword list
+Author: Manal Alyami
+Version: 1.0.0 - Shared Keyword Trie
+========================================
+"""
+
+import re
+from typing import Dict, FrozenSet, Iterable, List, Optional
+
+# === KEYWORD CATEGORIES ===
+# One category per keyword list used in the pipeline. Categories keep the
+# exact lists they replaced, so overlapping ones (e.g. "sensitive" and
+# "sensitive_quick") stay separate. All keywords are matched as lowercase
+# substrings, like the original `word in text_lower` checks.
+KEYWORD_CATEGORIES: Dict[str, List[str]] = {
+    # Message content (create_enhanced_analysis)
+    "sensitive": [
+        'password', 'pin', 'otp', 'cvv', 'card number', 'credit card', 'id card', 'national id', 'iban', 'bank account',
+        'كلمة المرور', 'كلمة السر', 'رقم التعريف', 'الرقم الوطني', 'رمز التحقق', 'البطاقة', 'رقم الحساب', 'ايبان'
+    ],
+    "threat": [
+        'suspended', 'terminated', 'locked', 'blocked', 'deleted', 'disabled', 'deactivated',
+        'تم إيقاف', 'تم حظر', 'سيتم حذف', 'معلق', 'تم تعطيل', 'تم إلغاء'
+    ],
+    "urgency": [
+        'urgent', 'immediately', 'now', 'today', 'within 24 hours', 'act now', 'limited time', 'act immediately',
+        'عاجل', 'فوراً', 'حالاً', 'خلال 24 ساعة', '限期', 'مباشرة'
+    ],
+    "prize": [
+        'winner', 'prize', 'lottery', 'congratulations', 'you won', 'free money', 'cash prize',
+        'فائز', 'جائزة', 'فرصة', 'مجاناً', 'لقد ربحت'
+    ],
+    "impersonation": [
+        'urgent from security', 'fraud department', 'security team', 'fraud alert',
+        'security alert', 'fraud detection', 'security department'
+    ],
+    "gov_service": ['أبشر', 'absher', 'ناجز', 'najiz', 'وزارة', 'ministry', 'government'],
+
+    # Message content (analyze_message_with_llm trust checks)
+    "sensitive_quick": ['password', 'pin', 'otp', 'cvv', 'كلمة المرور', 'رمز التحقق'],
+    "trusted_sensitive": ['password', 'pin', 'otp', 'cvv', 'card', 'كلمة المرور', 'رمز التحقق', 'رقم الحساب'],
+    "trusted_threat": ['suspended', 'blocked', 'deleted', 'locked', 'terminate', 'suspend', 'حظر', 'حذف', 'إيقاف'],
+    "trusted_prize": ['winner', 'prize', 'congratulations', 'won', 'free money', 'جائزة', 'فائز', 'لقد ربحت'],
+
+    # Message content (API endpoints)
+    "suspicious_pattern": ['<script', 'javascript:', 'vbscript:', 'onerror=', 'onload=', 'eval(', 'exec('],
+    "security_event": ['password', 'pin', 'otp', 'cvv', 'card', 'login', 'verify'],
+
+    # URLs
+    "url_keyword": [
+        'login', 'verify', 'account', 'update', 'secure', 'banking', 'paypal', 'amazon',
+        'microsoft', 'apple', 'google', 'facebook', 'signin', 'sign-in',
+        'security', 'support', 'admin', 'webmail', 'ebay', 'sso'
+    ],
+}
+
+
+class KeywordHits:
+    """Categories and keywords found in one text; `"threat" in hits` tests a category"""
+
+    __slots__ = ('categories', 'keywords')
+
+    def __init__(self, categories: FrozenSet[str], keywords: FrozenSet[str]):
+        self.categories = categories
+        self.keywords = keywords
+
+    def __contains__(self, category: str) -> bool:
+        return category in self.categories
+
+    def __bool__(self) -> bool:
+        return bool(self.categories)
+
+    def __repr__(self) -> str:
+        return f"KeywordHits(categories={sorted(self.categories)})"
+
+
+class KeywordIndex:
+    """
+    All keywords of all categories in one trie, compiled into a single regex
+    The regex is a zero-width lookahead tried at every position, so one scan
+    finds every keyword occurrence (overlaps included): the trie yields the
+    longest keyword at each position and the keywords that are its prefixes
+    are added from a table built with the trie
+    """
+
+    def __init__(self, categories: Dict[str, Iterable[str]]):
+        self._categories_of: Dict[str, FrozenSet[str]] = {}
+        for category, keywords in categories.items():
+            for keyword in keywords:
+                if keyword:
+                    self._categories_of[keyword] = self._categories_of.get(keyword, frozenset()) | {category}
+
+        trie: Dict = {}
+        for keyword in self._categories_of:
+            node = trie
+            for char in keyword:
+                node = node.setdefault(char, {})
+            node[''] = keyword
+
+        # Keywords that end on the path of each keyword (itself included)
+        self._prefixes: Dict[str, FrozenSet[str]] = {}
+        for keyword in self._categories_of:
+            node, found = trie, []
+            for char in keyword:
+                node = node[char]
+                if '' in node:
+                    found.append(node[''])
+            self._prefixes[keyword] = frozenset(found)
+
+        self._pattern: Optional[re.Pattern] = (
+            re.compile('(?=(' + self._trie_regex(trie) + '))') if trie else None
+        )
+        self.keyword_count = len(self._categories_of)
+
+    @classmethod
+    def _trie_regex(cls, node: Dict) -> str:
+        branches = [re.escape(char) + cls._trie_regex(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        # A keyword ends here: the longer continuations are optional (greedy, so longest wins)
+        return f'(?:{body})?' if '' in node else body
+
+    def scan(self, text: str) -> KeywordHits:
+        """Match every category against already-lowercased text in one pass"""
+        if self._pattern is None:
+            return KeywordHits(frozenset(), frozenset())
+
+        keywords = set()
+        prefixes = self._prefixes
+        for match in self._pattern.finditer(text):
+            keywords.update(prefixes[match.group(1)])
+
+        categories = set()
+        for keyword in keywords:
+            categories.update(self._categories_of[keyword])
+        return KeywordHits(frozenset(categories), frozenset(keywords))
+
+
+# Built once at import and shared by every caller
+KEYWORD_INDEX = KeywordIndex(KEYWORD_CATEGORIES)
+
+
+def scan_keywords(text: str) -> KeywordHits:
+    """Keyword categories present in a message (case-insensitive)"""
+    return KEYWORD_INDEX.scan(text.lower())
@@ -11,10 +11,26 @@ Version: 2.1.0 - Trust Override & Arabic UX
 import os
 import re
 import json
+import time
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from typing import List, Optional, Dict
 from pydantic import BaseModel
 import hashlib
 
+from .rules import rule_registry
+from .trust import trusted_domains
+from .urls import parse_url
+from .context import MessageContext
+from .translations import red_flag_catalog
+from .homograph import find_lookalike
+from .reference_data import reference_data
+from .llm_cache import llm_verdict_cache
+from .near_duplicate import NearDuplicateHit, near_duplicate_index
+from .singleflight import SingleFlight
+from .circuit_breaker import CircuitBreaker
+
 try:
     from huggingface_hub import InferenceClient
     HF_AVAILABLE = True
@@ -25,29 +41,35 @@ except ImportError:
 # Configuration
 HF_API_KEY = os.getenv("HF_API_KEY")
 LLM_MODEL = "meta-llama/Meta-Llama-3-8B-Instruct"
-
-# Trusted Saudi Government Domains
-TRUSTED_DOMAINS = [
-    'absher.sa',
-    'najiz.sa',
-    'moi.gov.sa',
-    'moj.gov.sa',
-    'spa.gov.sa',
-    'my.gov.sa',
-    '.gov.sa'  # All .gov.sa domains
-]
+PROMPT_VERSION = "2.1"  # bump when the prompt or response handling changes, so cached verdicts are not reused
+LLM_BASE_URL = os.getenv("LLM_BASE_URL")  # OpenAI-compatible endpoint (self-hosted TGI, local stub) instead of the HF API
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))  # LLM calls in flight per worker
+LLM_MAX_IN_FLIGHT = int(os.getenv("LLM_MAX_IN_FLIGHT", str(LLM_MAX_CONCURRENCY)))  # gateway admission limit
+LLM_CALL_TIMEOUT_SECONDS = float(os.getenv("LLM_CALL_TIMEOUT_SECONDS", "8"))    # hard deadline incl. queueing
+LLM_SLOW_CALL_SECONDS = float(os.getenv("LLM_SLOW_CALL_SECONDS", "4"))          # slower calls count as failures
+LLM_BREAKER_FAILURE_THRESHOLD = int(os.getenv("LLM_BREAKER_FAILURE_THRESHOLD", "5"))
+LLM_BREAKER_COOLDOWN_SECONDS = float(os.getenv("LLM_BREAKER_COOLDOWN_SECONDS", "30"))
+
+# Trusted Saudi Government Domains (backend/data/trusted_domains.txt)
+TRUSTED_DOMAINS = trusted_domains.entries
 
 # Initialize client
 llm_client = None
-if HF_AVAILABLE and HF_API_KEY:
+if HF_AVAILABLE and LLM_BASE_URL:
     try:
-        llm_client = InferenceClient(token=HF_API_KEY)
+        llm_client = InferenceClient(base_url=LLM_BASE_URL, api_key=HF_API_KEY, timeout=LLM_CALL_TIMEOUT_SECONDS)
+        print(f"✅ LLM client initialized with endpoint: {LLM_BASE_URL}")
+    except Exception as e:
+        print(f"⚠️ LLM client initialization failed: {e}")
+elif HF_AVAILABLE and HF_API_KEY:
+    try:
+        llm_client = InferenceClient(token=HF_API_KEY, timeout=LLM_CALL_TIMEOUT_SECONDS)
         print(f"✅ LLM client initialized with model: {LLM_MODEL}")
     except Exception as e:
         print(f"⚠️ LLM client initialization failed: {e}")
 elif HF_AVAILABLE:
     try:
-        llm_client = InferenceClient()
+        llm_client = InferenceClient(timeout=LLM_CALL_TIMEOUT_SECONDS)
         print(f"⚠️ LLM client initialized without API key (rate limited)")
     except Exception as e:
         print(f"⚠️ LLM client initialization failed: {e}")
@@ -65,72 +87,13 @@ class LLMAnalysis(BaseModel):
 
 
 def is_trusted_domain(url: str) -> bool:
-    """Check if URL belongs to trusted Saudi government domain"""
-    url_lower = url.lower()
-    
-    # Remove protocol if present
-    if '://' in url_lower:
-        url_lower = url_lower.split('://', 1)[1]
-    
-    # Extract just the domain part (before any path)
-    if '/' in url_lower:
-        domain_only = url_lower.split('/', 1)[0]
-    else:
-        domain_only = url_lower
-    
-    # Check against trusted domains
-    for domain in TRUSTED_DOMAINS:
-        if domain == '.gov.sa':  # Special case for all .gov.sa domains
-            if domain_only.endswith('.gov.sa'):
-                return True
-        elif domain in domain_only:
-            # Check if it's the exact domain or a subdomain of the trusted domain
-            if domain_only == domain or domain_only.endswith('.' + domain):
-                return True
-    
-    return False
-
-
-def translate_red_flag(flag: str) -> str:
-    """Translate red flag to user-friendly Arabic"""
-    translations = {
-        'urgency': 'أسلوب الاستعجال والضغط',
-        'urgent': 'أسلوب الاستعجال والضغط',
-        'pressure': 'أسلوب ضغط وإكراه',
-        'suspicious url': 'رابط غير موثوق',
-        'shortened url': 'روابط مختصرة مشبوهة',
-        'url shortener': 'روابط مختصرة مشبوهة',
-        'shortener': 'روابط مختصرة',
-        'personal information': 'طلب معلومات حساسة',
-        'personal info': 'طلب معلومات حساسة',
-        'password': 'طلب كلمة مرور',
-        'impersonation': 'انتحال هوية جهة رسمية',
-        'government': 'انتحال صفة جهة حكومية',
-        'threat': 'تهديدات وإنذارات',
-        'threatening': 'لغة تهديدية',
-        'reward': 'وعود بجوائز ومكافآت',
-        'prize': 'وعود بجوائز وهمية',
-        'suspicious domain': 'نطاق غير موثوق',
-        'insecure': 'اتصال غير آمن',
-        'social engineering': 'محاولة خداع نفسي',
-        'phishing': 'محاولة احتيال',
-        'sensitive data': 'طلب بيانات حساسة',
-        'signature_match_0': 'طلب معلومات حساسة',
-        'signature_match_1': 'توعّد بتعليق الحساب',
-        'signature_match_2': 'لغة استعجال وضغط',
-        'signature_match_3': 'وعود بجوائز',
-        'signature_match_4': 'طلب معلومات حساسة (عربي)',
-        'suspicious_url_pattern_0': 'روابط مختصرة',
-        'suspicious_url_pattern_1': 'عناوين IP مباشرة',
-        'suspicious_url_pattern_2': 'نطاقات مشابهة لمواقع رسمية'
-    }
-    
-    flag_lower = flag.lower()
-    for key, value in translations.items():
-        if key in flag_lower:
-            return value
-    
-    return flag  # Return original if no translation found
+    """Check if URL belongs to trusted Saudi government domain (exact domain or subdomain)"""
+    return parse_url(url).is_trusted
+
+
+def translate_red_flag(flag: str, language: str = "ar") -> str:
+    """Translate red flag to user-friendly text (Arabic by default), see data/red_flags.json"""
+    return red_flag_catalog.translate(flag, language)
 
 
 def create_enhanced_prompt(message: str, urls: List[str]) -> tuple:
@@ -204,7 +167,7 @@ MESSAGE:
 URLS FOUND:
 {urls_text}
 
-TRUSTED DOMAINS: {', '.join(TRUSTED_DOMAINS)}
+TRUSTED DOMAINS: {trusted_domains.prompt_summary()}
 ALL URLS TRUSTED: {all_urls_trusted}
 
 Respond with JSON only."""
@@ -237,7 +200,7 @@ def parse_llm_response(response_text: str) -> Optional[dict]:
     return None
 
 
-def signature_based_analysis(message: str, urls: List[str]) -> tuple:
+def signature_based_analysis(context: MessageContext) -> tuple:
     """
     Signature-based analysis method for quick phishing detection
     Uses known phishing patterns and signatures to identify threats
@@ -247,45 +210,24 @@ def signature_based_analysis(message: str, urls: List[str]) -> tuple:
     red_flags = []
     score = 0
     
-    message_lower = message.lower()
-    
-    # Known phishing signatures and patterns
-    phishing_signatures = [
-        # Password/credential requests
-        r'\b(?:password|pin|otp|cvv|card|credit card|bank account|iban)\b',
-        # Urgency indicators
-        r'\b(?:suspended|locked|blocked|deleted|terminate|deactivate)\b',
-        # Threat indicators
-        r'\b(?:urgent|immediately|now|today|within.*24.*hours|act.*now)\b',
-        # Prize/lottery indicators
-        r'\b(?:winner|prize|lottery|won|free.*money|cash.*prize)\b',
-        # Arabic equivalents
-        r'(?:\u0643\u0644\u0645\u0629\s*\u0627\u0644\u0645\u0631\u0648\u0631|\u0631\u0645\u0632|\u0627\u0644\u062a\u062d\u062f\u064a\u062f|\u0641\u0627\u0626\u0632|\u062c\u0627\u0626\u0632\u0629|\u0631\u0627\u0626\u062f)\b'
-    ]
+    # Pick up signature updates pushed to the rules file (no restart needed)
+    rule_registry.check_for_updates()
     
-    # Check for signature matches
-    for i, signature in enumerate(phishing_signatures):
-        if re.search(signature, message_lower):
-            score += 15
-            red_flags.append(f"signature_match_{i}")
+    # Known phishing signatures and patterns (backend/data/rules.json)
+    for rule in rule_registry.match("message_signatures", context.lower):
+        score += rule.score
+        red_flags.append(rule.id)
     
     # Check for suspicious URLs
-    suspicious_patterns = [
-        r'\b(?:bit\.ly|tinyurl\.com|goo\.gl|ow\.ly|t\.co|is\.gd|cutt\.ly)\b',
-        r'\b\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}\b',  # IP addresses
-        r'(?:abshar|absher-?login|najiz-?secure)\b'  # Lookalike domains
-    ]
-    
-    for url in urls:
-        for i, pattern in enumerate(suspicious_patterns):
-            if re.search(pattern, url.lower()):
-                score += 20
-                red_flags.append(f"suspicious_url_pattern_{i}")
+    for parsed in context.parsed_urls:
+        for rule in rule_registry.match("url_patterns", parsed.lower):
+            score += rule.score
+            red_flags.append(rule.id)
     
     return score, red_flags
 
 
-def create_enhanced_analysis(message: str, urls: List[str]) -> LLMAnalysis:
+def create_enhanced_analysis(context: MessageContext) -> LLMAnalysis:
     """
     Create enhanced heuristic analysis with trust recognition
     This implements the TRUST OVERRIDE logic
@@ -296,40 +238,22 @@ def create_enhanced_analysis(message: str, urls: List[str]) -> LLMAnalysis:
     red_flags = []
     score = 0  # Reset base score to 0 to reduce false positives
     
-    message_lower = message.lower()
+    urls = context.urls
+    keyword_hits = context.keyword_hits
     
     # === TRUST CHECK ===
-    all_urls_trusted = bool(all(is_trusted_domain(url) for url in urls)) if urls else False
+    all_urls_trusted = context.all_urls_trusted
     has_urls = len(urls) > 0
     
     # Check for URL shorteners (HIGH RISK even with trusted domains)
-    shorteners = ['bit.ly', 'tinyurl', 'goo.gl', 'ow.ly', 't.co', 'is.gd', 'cutt.ly', 'bitly', 'adf.ly', 'bc.vc']
-    has_shorteners = any(short in url.lower() for url in urls for short in shorteners)
-    
-    # Check for sensitive data requests (HIGH RISK)
-    sensitive_keywords = ['password', 'pin', 'otp', 'cvv', 'card number', 'credit card', 'id card', 'national id', 'iban', 'bank account',
-                         'كلمة المرور', 'كلمة السر', 'رقم التعريف', 'الرقم الوطني', 'رمز التحقق', 'البطاقة', 'رقم الحساب', 'ايبان']
-    requests_sensitive = any(word in message_lower for word in sensitive_keywords)
-    
-    # Check for aggressive urgency/threats (HIGH RISK)
-    threat_words = ['suspended', 'terminated', 'locked', 'blocked', 'deleted', 'disabled', 'deactivated',
-                   'تم إيقاف', 'تم حظر', 'سيتم حذف', 'معلق', 'تم تعطيل', 'تم إلغاء']
-    has_threats = any(word in message_lower for word in threat_words)
-    
-    # Check for urgency pressure
-    urgency_words = ['urgent', 'immediately', 'now', 'today', 'within 24 hours', 'act now', 'limited time', 'act immediately',
-                    'عاجل', 'فوراً', 'حالاً', 'خلال 24 ساعة', '限期', 'مباشرة']
-    has_urgency = any(word in message_lower for word in urgency_words)
-    
-    # Check for prize/reward promises (MEDIUM RISK)
-    prize_words = ['winner', 'prize', 'lottery', 'congratulations', 'you won', 'free money', 'cash prize',
-                  'فائز', 'جائزة', 'فرصة', 'مجاناً', 'لقد ربحت']
-    has_prizes = any(word in message_lower for word in prize_words)
-    
-    # Check for impersonation attempts
-    impersonation_words = ['urgent from security', 'fraud department', 'security team', 'fraud alert',
-                          'security alert', 'fraud detection', 'security department']
-    has_impersonation = any(word in message_lower for word in impersonation_words)
+    has_shorteners = any(reference_data.is_shortener(parsed) for parsed in context.parsed_urls)
+    
+    # Keyword categories (see keywords.KEYWORD_CATEGORIES), matched in one pass
+    requests_sensitive = "sensitive" in keyword_hits        # HIGH RISK
+    has_threats = "threat" in keyword_hits                  # HIGH RISK
+    has_urgency = "urgency" in keyword_hits
+    has_prizes = "prize" in keyword_hits                    # MEDIUM RISK
+    has_impersonation = "impersonation" in keyword_hits
     
     # === TRUST OVERRIDE LOGIC ===
     if all_urls_trusted and has_urls and not has_shorteners and not requests_sensitive:
@@ -393,28 +317,20 @@ def create_enhanced_analysis(message: str, urls: List[str]) -> LLMAnalysis:
         red_flags.append("urgency tactics")
     
     # Government impersonation without trusted domains
-    gov_services = ['أبشر', 'absher', 'ناجز', 'najiz', 'وزارة', 'ministry', 'government']
-    if any(s in message_lower for s in gov_services):
+    if "gov_service" in keyword_hits:
         if not all_urls_trusted and has_urls:
             score += 30
             red_flags.append("potential government impersonation")
     
     # Insecure links
-    if urls and any(url.lower().startswith('http://') for url in urls):
+    if urls and any(parsed.lower.startswith('http://') for parsed in context.parsed_urls):
         score += 15
         red_flags.append("insecure links")
     
-    # Lookalike domains
-    if urls:
-        for url in urls:
-            # Check for common lookalike substitutions
-            lookalike_indicators = ['0' in url and 'o' not in url,  # Using 0 instead of o
-                                  '1' in url and 'l' not in url,  # Using 1 instead of l
-                                  'rn' in url and 'm' not in url]  # Using rn instead of m
-            if any(lookalike_indicators):
-                score += 25
-                red_flags.append("potential lookalike domain")
-                break
+    # Lookalike domains (hosts imitating a protected brand, see homograph.py)
+    if any(find_lookalike(parsed) for parsed in context.parsed_urls):
+        score += 25
+        red_flags.append("potential lookalike domain")
     
     # Multiple risk indicators - apply penalty for combination
     risk_indicators_count = sum([
@@ -426,7 +342,7 @@ def create_enhanced_analysis(message: str, urls: List[str]) -> LLMAnalysis:
         score += risk_indicators_count * 10  # Additional penalty for multiple indicators
     
     # === COMBINE WITH SIGNATURE-BASED ANALYSIS ===
-    signature_score, signature_flags = signature_based_analysis(message, urls)
+    signature_score, signature_flags = signature_based_analysis(context)
     score = max(score, signature_score)  # Use the higher of the two scores
     if signature_flags:
         red_flags.extend([f"signature: {flag}" for flag in signature_flags])
@@ -485,19 +401,338 @@ def create_enhanced_analysis(message: str, urls: List[str]) -> LLMAnalysis:
     )
 
 
-async def analyze_message_with_llm(message: str, urls: List[str]) -> Optional[LLMAnalysis]:
+# === LLM CALL POOL ===
+
+class LLMCallPool:
+    """
+    Bounded thread pool for blocking LLM client calls
+    At most LLM_MAX_CONCURRENCY calls run at once per worker; further requests
+    wait on the pool queue without blocking the event loop
+    """
+
+    def __init__(self, max_workers: int = LLM_MAX_CONCURRENCY):
+        self.max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.calls = 0
+        self.errors = 0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="llm")
+        return self._executor
+
+    def _run(self, fn, *args, timing: Optional[Dict] = None):
+        with self._lock:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        if timing is not None:
+            timing["started"] = time.monotonic()  # stamped on the worker thread: excludes pool queueing
+        try:
+            return fn(*args)
+        except Exception:
+            with self._lock:
+                self.errors += 1
+            raise
+        finally:
+            if timing is not None:
+                timing["finished"] = time.monotonic()
+            with self._lock:
+                self.in_flight -= 1
+                self.calls += 1
+
+    def submit(self, fn, *args, timing: Optional[Dict] = None) -> Future:
+        """Queue a call; `timing` gets the call's start and finish times from the worker thread"""
+        return self._get_executor().submit(self._run, fn, *args, timing=timing)
+
+    async def run(self, fn, *args):
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> Dict:
+        return {
+            "max_concurrency": self.max_workers,
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "calls": self.calls,
+            "errors": self.errors
+        }
+
+
+llm_call_pool = LLMCallPool()
+
+
+# === LLM GATEWAY ===
+
+class LLMUnavailable(Exception):
+    """The gateway did not get an LLM answer; callers fall back to the heuristic analysis"""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class LLMGateway:
+    """
+    Admission control in front of the LLM call pool
+    - at most max_in_flight calls are admitted; the rest wait for a slot
+    - a slot is held until the pool thread finishes, not until the caller
+      stops waiting, so a timed-out call still counts against max_in_flight
+      (capped at the pool size, so admitted calls never queue in the pool)
+    - every call (waiting included) has a hard deadline of timeout_seconds
+    - the breaker only sees endpoint time, measured on the pool thread;
+      running out of time mostly while queued is reported as queue_timeout
+    - a circuit breaker opens after consecutive failures or slow calls; while
+      it is open calls are refused immediately instead of waiting on a
+      struggling endpoint
+    Refused, timed-out and failed calls raise LLMUnavailable
+    """
+
+    FALLBACK_REASONS = ("breaker_open", "queue_timeout", "timeout", "error")
+
+    def __init__(self, pool: LLMCallPool, max_in_flight: int = LLM_MAX_IN_FLIGHT,
+                 timeout_seconds: float = LLM_CALL_TIMEOUT_SECONDS,
+                 breaker: Optional[CircuitBreaker] = None):
+        self.pool = pool
+        self.max_in_flight = min(max(max_in_flight, 1), pool.max_workers)
+        self.timeout_seconds = timeout_seconds
+        self.breaker = breaker or CircuitBreaker(
+            LLM_BREAKER_FAILURE_THRESHOLD, LLM_SLOW_CALL_SECONDS, LLM_BREAKER_COOLDOWN_SECONDS
+        )
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._semaphore_loop = None
+        self.in_flight = 0
+        self.requests = 0
+        self.fallbacks = dict.fromkeys(self.FALLBACK_REASONS, 0)
+
+    def _slots(self) -> asyncio.Semaphore:
+        # asyncio primitives belong to one event loop; make a new one if the loop changed
+        loop = asyncio.get_running_loop()
+        if self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+            self._semaphore_loop = loop
+        return self._semaphore
+
+    async def _admitted(self, call: Dict, fn, *args):
+        slots = self._slots()
+        await slots.acquire()
+        self.in_flight += 1
+        loop = asyncio.get_running_loop()
+        try:
+            future = self.pool.submit(fn, *args, timing=call)
+        except BaseException:
+            self._release(slots)
+            raise
+        # Cancelling the wait doesn't stop the thread; give the slot back when the thread is done
+        future.add_done_callback(lambda _: self._release_from_thread(loop, slots))
+        return await asyncio.wrap_future(future)
+
+    def _release(self, slots: asyncio.Semaphore) -> None:
+        self.in_flight -= 1
+        slots.release()
+
+    def _release_from_thread(self, loop: asyncio.AbstractEventLoop, slots: asyncio.Semaphore) -> None:
+        try:
+            loop.call_soon_threadsafe(self._release, slots)
+        except RuntimeError:
+            pass  # loop already closed; its semaphore goes with it
+
+    def _fallback(self, reason: str) -> LLMUnavailable:
+        self.fallbacks[reason] += 1
+        return LLMUnavailable(reason)
+
+    async def run(self, fn, *args):
+        self.requests += 1
+        if not self.breaker.allow():
+            raise self._fallback("breaker_open")
+
+        call: Dict = {}  # started / finished, written by the pool thread
+        try:
+            result = await asyncio.wait_for(self._admitted(call, fn, *args), timeout=self.timeout_seconds)
+        except asyncio.TimeoutError:
+            endpoint_time = self._endpoint_time(call)
+            if endpoint_time <= self.breaker.slow_call_seconds:
+                # Most of the deadline went on waiting for a slot: local backlog, not an endpoint failure
+                self.breaker.release()
+                raise self._fallback("queue_timeout")
+            self.breaker.record(endpoint_time, f"timeout after {endpoint_time:.1f}s at the endpoint")
+            raise self._fallback("timeout")
+        except asyncio.CancelledError:
+            self.breaker.release()
+            raise
+        except Exception as e:
+            print(f"❌ LLM call failed: {e}")
+            self.breaker.record(self._endpoint_time(call), f"{type(e).__name__}: {e}")
+            raise self._fallback("error") from e
+        self.breaker.record(self._endpoint_time(call))
+        return result
+
+    @staticmethod
+    def _endpoint_time(call: Dict) -> float:
+        """Time the pool thread has spent on the call so far (0 if it never started)"""
+        started = call.get("started")
+        if started is None:
+            return 0.0
+        return call.get("finished", time.monotonic()) - started
+
+    def stats(self) -> Dict:
+        fallbacks = sum(self.fallbacks.values())
+        return {
+            "breaker": self.breaker.stats(),
+            "max_in_flight": self.max_in_flight,
+            "in_flight": self.in_flight,
+            "timeout_seconds": self.timeout_seconds,
+            "requests": self.requests,
+            "fallbacks": dict(self.fallbacks),
+            "fallback_rate": round(fallbacks / self.requests, 4) if self.requests else 0.0
+        }
+
+
+llm_gateway = LLMGateway(llm_call_pool)
+
+# Identical messages arriving together share one LLM call (keyed by llm_cache_key)
+llm_single_flight = SingleFlight("llm")
+
+
+def request_llm_completion(messages: List[Dict]) -> str:
+    """Blocking chat completion request; returns the response text"""
+    try:
+        response = llm_client.chat_completion(
+            model=LLM_MODEL,
+            messages=messages,
+            temperature=0.1,
+            max_tokens=500,
+        )
+        
+        if hasattr(response, 'choices') and response.choices:
+            return response.choices[0].message.content
+        return str(response)
+        
+    except AttributeError:
+        response = llm_client.chat(
+            model=LLM_MODEL,
+            messages=messages,
+            temperature=0.1
+        )
+        return response.get("generated_text", str(response))
+
+
+def llm_cache_key(context: MessageContext) -> str:
+    """Content address of an LLM verdict: normalized message, URL set, prompt version and model"""
+    material = [PROMPT_VERSION, LLM_MODEL, ' '.join(context.normalized.split()), sorted(set(context.urls))]
+    return hashlib.sha256(json.dumps(material, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+async def _llm_verdict(context: MessageContext, cache_key: str,
+                       near_duplicate: Optional[NearDuplicateHit]) -> Optional[LLMAnalysis]:
+    """
+    One LLM call and everything derived from it: the parsed verdict, the cache
+    write, the near-duplicate entry and the audit comparison. Returns None when
+    the answer can't be parsed; raises LLMUnavailable when the gateway gives up
+    """
+    keyword_hits = context.keyword_hits
+    system_message, user_message = create_enhanced_prompt(context.text, context.urls)
+    
+    messages = [
+        {"role": "system", "content": system_message},
+        {"role": "user", "content": user_message}
+    ]
+    
+    # The HF client is synchronous: the gateway runs it on the LLM pool (bounded, with a
+    # deadline and circuit breaker) so the event loop keeps serving
+    response_text = await llm_gateway.run(request_llm_completion, messages)
+    
+    data = parse_llm_response(response_text)
+    
+    if data:
+        # Apply trust override to LLM results
+        is_trusted = context.all_urls_trusted
+        
+        # Get red flags and filter out debug/incomplete messages
+        raw_flags = list(data.get("red_flags", []))
+        
+        # Filter out debug messages and incomplete flags
+        filtered_flags = []
+        for flag in raw_flags:
+            flag_lower = flag.lower()
+            # Skip if it looks like debug text or incomplete message
+            skip_flag = False
+            debug_indicators = [
+                'missing', 'debug', 'error', 'in url', 's in', 'review', 'enhance', 'logic', 'conflicts',
+                'review the', 'enhance the', 'missing', 'incomplete', 'issue with',
+                'check for', 'analyze', 'note:', 'note :', 'todo:', 'fix:', 'debug:',
+                'placeholder', 'template', 'sample', 'example'
+            ]
+            for indicator in debug_indicators:
+                if indicator in flag_lower:
+                    skip_flag = True
+                    break
+            
+            if not skip_flag:
+                filtered_flags.append(flag)
+        
+        raw_flags = filtered_flags
+        red_flags_ar = [translate_red_flag(flag) for flag in raw_flags] if raw_flags else ["لم يتم اكتشاف مؤشرات احتيال واضحة"]
+        
+        # Extract values with proper handling
+        is_phishing = bool(data.get("is_phishing", False))
+        confidence = float(data.get("confidence", 50))
+        
+        # TRUST OVERRIDE: More nuanced approach
+        if is_trusted:
+            # Check for conflicting signals - trusted domain but suspicious content
+            has_suspicious_content = "trusted_sensitive" in keyword_hits
+            has_urgent_threats = "trusted_threat" in keyword_hits
+            has_prize_claims = "trusted_prize" in keyword_hits
+            
+            if has_suspicious_content or has_urgent_threats or has_prize_claims:
+                # Even trusted domains with suspicious content should be flagged
+                is_phishing = True
+                confidence = max(confidence, 60.0)  # Increase confidence for suspicious content
+            else:
+                # Legitimate trusted source
+                is_phishing = False
+                confidence = min(confidence, 25.0)  # Cap at 25% for trusted sources
+                red_flags_ar = ["لم يتم اكتشاف مؤشرات احتيال واضحة"]
+        
+        analysis = LLMAnalysis(
+            is_phishing=is_phishing,
+            confidence=confidence,
+            reasoning=str(data.get("reasoning", "Analysis completed")),
+            red_flags=raw_flags if raw_flags else ["no significant red flags"],
+            red_flags_ar=red_flags_ar,
+            context_score=int(data.get("context_score", 50)),
+            model_used=LLM_MODEL,
+            is_trusted_source=is_trusted
+        )
+        # Only real model verdicts are cached; heuristic fallbacks are cheap to recompute
+        llm_verdict_cache.put(cache_key, analysis.model_dump_json())
+        if near_duplicate is not None:
+            near_duplicate_index.record_audit(near_duplicate.verdict, analysis)
+        near_duplicate_index.add(context, analysis)
+        return analysis
+    return None
+
+
+async def analyze_message_with_llm(context: MessageContext) -> Optional[LLMAnalysis]:
     """Analyze message using LLM with trust override"""
     
+    urls = context.urls
+    keyword_hits = context.keyword_hits
+    
     # First, check for immediate trust override
     if urls:
-        all_urls_trusted = bool(all(is_trusted_domain(url) for url in urls))
-        has_shorteners = any(short in url.lower() for url in urls 
-                            for short in ['bit.ly', 'tinyurl', 'goo.gl'])
-        
-        message_lower = message.lower()
-        sensitive_keywords = ['password', 'pin', 'otp', 'cvv', 
-                             'كلمة المرور', 'رمز التحقق']
-        requests_sensitive = any(word in message_lower for word in sensitive_keywords)
+        all_urls_trusted = context.all_urls_trusted
+        has_shorteners = any(reference_data.is_shortener(parsed) for parsed in context.parsed_urls)
+        requests_sensitive = "sensitive_quick" in keyword_hits
         
         # TRUST OVERRIDE: If trusted domains + no major red flags = SAFE
         if all_urls_trusted and not has_shorteners and not requests_sensitive:
@@ -514,106 +749,34 @@ async def analyze_message_with_llm(message: str, urls: List[str]) -> Optional[LL
     
     # If LLM unavailable, use enhanced heuristic
     if not llm_client:
-        return create_enhanced_analysis(message, urls)
+        return create_enhanced_analysis(context)
+    
+    # Repeated campaign messages reuse the verdict instead of another LLM call
+    cache_key = llm_cache_key(context)
+    cached = await llm_verdict_cache.aget(cache_key, LLMAnalysis.model_validate_json)
+    if cached is not None:
+        return cached
+    
+    # Campaign variants (other names, amounts, links) reuse a recent verdict;
+    # a sampled share still goes to the LLM to measure agreement
+    near_duplicate = near_duplicate_index.find(context)
+    if near_duplicate is not None and not near_duplicate.audit:
+        return near_duplicate.verdict
     
     try:
-        system_message, user_message = create_enhanced_prompt(message, urls)
-        
-        messages = [
-            {"role": "system", "content": system_message},
-            {"role": "user", "content": user_message}
-        ]
-        
-        try:
-            response = llm_client.chat_completion(
-            model=LLM_MODEL,
-            messages=messages,
-            temperature=0.1,
-            max_tokens=500,
+        # Concurrent requests for the same message wait on the leader's call; the leader parses
+        # the answer and updates the caches and audit metrics once for all of them
+        analysis = await llm_single_flight.do(
+            cache_key, lambda: _llm_verdict(context, cache_key, near_duplicate)
         )
+        return analysis if analysis is not None else create_enhanced_analysis(context)
             
-            if hasattr(response, 'choices') and response.choices:
-                response_text = response.choices[0].message.content
-            else:
-                response_text = str(response)
-                
-        except AttributeError:
-            response = llm_client.chat(
-                model=LLM_MODEL,
-                messages=messages,
-                temperature=0.1
-            )
-            response_text = response.get("generated_text", str(response))
-        
-        data = parse_llm_response(response_text)
-        
-        if data:
-            # Apply trust override to LLM results
-            is_trusted = bool(urls and all(is_trusted_domain(url) for url in urls))
-            
-            # Get red flags and filter out debug/incomplete messages
-            raw_flags = list(data.get("red_flags", []))
-            
-            # Filter out debug messages and incomplete flags
-            filtered_flags = []
-            for flag in raw_flags:
-                flag_lower = flag.lower()
-                # Skip if it looks like debug text or incomplete message
-                skip_flag = False
-                debug_indicators = [
-                    'missing', 'debug', 'error', 'in url', 's in', 'review', 'enhance', 'logic', 'conflicts',
-                    'review the', 'enhance the', 'missing', 'incomplete', 'issue with',
-                    'check for', 'analyze', 'note:', 'note :', 'todo:', 'fix:', 'debug:',
-                    'placeholder', 'template', 'sample', 'example'
-                ]
-                for indicator in debug_indicators:
-                    if indicator in flag_lower:
-                        skip_flag = True
-                        break
-                
-                if not skip_flag:
-                    filtered_flags.append(flag)
-            
-            raw_flags = filtered_flags
-            red_flags_ar = [translate_red_flag(flag) for flag in raw_flags] if raw_flags else ["لم يتم اكتشاف مؤشرات احتيال واضحة"]
-            
-            # Extract values with proper handling
-            is_phishing = bool(data.get("is_phishing", False))
-            confidence = float(data.get("confidence", 50))
-            
-            # TRUST OVERRIDE: More nuanced approach
-            if is_trusted:
-                # Check for conflicting signals - trusted domain but suspicious content
-                has_suspicious_content = any(word in message.lower() for word in ['password', 'pin', 'otp', 'cvv', 'card', 'كلمة المرور', 'رمز التحقق', 'رقم الحساب'])
-                has_urgent_threats = any(word in message.lower() for word in ['suspended', 'blocked', 'deleted', 'locked', 'terminate', 'suspend', 'حظر', 'حذف', 'إيقاف'])
-                has_prize_claims = any(word in message.lower() for word in ['winner', 'prize', 'congratulations', 'won', 'free money', 'جائزة', 'فائز', 'لقد ربحت'])
-                
-                if has_suspicious_content or has_urgent_threats or has_prize_claims:
-                    # Even trusted domains with suspicious content should be flagged
-                    is_phishing = True
-                    confidence = max(confidence, 60.0)  # Increase confidence for suspicious content
-                else:
-                    # Legitimate trusted source
-                    is_phishing = False
-                    confidence = min(confidence, 25.0)  # Cap at 25% for trusted sources
-                    red_flags_ar = ["لم يتم اكتشاف مؤشرات احتيال واضحة"]
-            
-            return LLMAnalysis(
-                is_phishing=is_phishing,
-                confidence=confidence,
-                reasoning=str(data.get("reasoning", "Analysis completed")),
-                red_flags=raw_flags if raw_flags else ["no significant red flags"],
-                red_flags_ar=red_flags_ar,
-                context_score=int(data.get("context_score", 50)),
-                model_used=LLM_MODEL,
-                is_trusted_source=is_trusted
-            )
-        else:
-            return create_enhanced_analysis(message, urls)
-            
+    except LLMUnavailable:
+        # Breaker open, deadline passed or call failed: answer from the heuristic analysis
+        return create_enhanced_analysis(context)
     except Exception as e:
         print(f"❌ LLM analysis error: {e}")
-        return create_enhanced_analysis(message, urls)
+        return create_enhanced_analysis(context)
 
 
 def is_llm_available() -> bool:
@@ -0,0 +1,283 @@
+"""
+========================================
+Tanabbah - LLM Verdict Cache Module
+========================================
+Purpose: Content-addressed cache of LLM verdicts (memory LRU + SQLite)
+Author: Manal Alyami
+Version: 1.1.0 - Off-Loop Disk Tier
+========================================
+"""
+
+import os
+import time
+import queue
+import asyncio
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, TypeVar
+
+# Configuration
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "2048"))           # memory tier
+LLM_CACHE_DISK_MAX_ENTRIES = int(os.getenv("LLM_CACHE_DISK_MAX_ENTRIES", "100000"))  # SQLite tier
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", "86400"))
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(os.path.dirname(__file__), "data", "llm_cache.sqlite3"))
+DISK_PRUNE_EVERY = 256       # writes between size checks of the SQLite tier
+WRITE_QUEUE_SIZE = 1024      # pending disk writes; beyond this new writes are dropped (memory still has them)
+WRITE_BATCH_SIZE = 64        # writes committed per transaction by the writer thread
+
+T = TypeVar("T")
+
+
+def _open_db(path: str) -> sqlite3.Connection:
+    db = sqlite3.connect(path, timeout=5, check_same_thread=False)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")  # WAL + NORMAL: no fsync per commit
+    db.execute(
+        "CREATE TABLE IF NOT EXISTS verdicts ("
+        "key TEXT PRIMARY KEY, payload TEXT NOT NULL, "
+        "created_at REAL NOT NULL, expires_at REAL NOT NULL)"
+    )
+    db.execute("CREATE INDEX IF NOT EXISTS verdicts_created ON verdicts (created_at)")
+    db.commit()
+    return db
+
+
+class LLMVerdictCache:
+    """
+    Two-tier cache of serialized verdicts keyed by content hash
+    - memory: bounded LRU with TTL, per worker
+    - disk: SQLite file shared by all workers and kept across restarts
+    A disk hit is promoted to memory. Expiry uses wall-clock time so entries
+    written before a restart keep their original deadline.
+
+    Nothing touches SQLite on the event loop: aget() reads the disk tier in a
+    worker thread, and put() hands disk writes to a write-behind thread that
+    commits them in batches. The disk row count is tracked by the writer so
+    stats() never queries the file
+    """
+
+    def __init__(self, path: Optional[str] = LLM_CACHE_PATH, max_entries: int = LLM_CACHE_MAX_ENTRIES,
+                 disk_max_entries: int = LLM_CACHE_DISK_MAX_ENTRIES, ttl_seconds: float = LLM_CACHE_TTL_SECONDS):
+        self.path = path or None
+        self.max_entries = max_entries
+        self.disk_max_entries = disk_max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # key -> (expires_at, payload)
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None  # reader connection
+        self._db_pid: Optional[int] = None
+        self._db_lock = threading.Lock()
+        self._writes: Optional[queue.Queue] = None
+        self._writer: Optional[threading.Thread] = None
+        self._writer_pid: Optional[int] = None
+        self._writes_since_prune = 0
+        self.disk_entries: Optional[int] = None  # maintained by the writer thread
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.dropped_writes = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.disk_errors = 0
+
+    # === MEMORY TIER ===
+
+    def _memory_get(self, key: str, now: float) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= now:
+                del self._entries[key]
+                self.expirations += 1
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def _memory_put(self, key: str, payload: str, expires_at: float) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (expires_at, payload)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    # === DISK TIER (worker threads only) ===
+
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        """Per-process reader connection (opened lazily, so preloaded gunicorn workers don't share one)"""
+        if not self.path:
+            return None
+        if self._db is not None and self._db_pid == os.getpid():
+            return self._db
+        with self._db_lock:
+            if self._db is None or self._db_pid != os.getpid():
+                try:
+                    db = _open_db(self.path)
+                    if self.disk_entries is None:
+                        self.disk_entries = db.execute("SELECT COUNT(*) FROM verdicts").fetchone()[0]
+                except sqlite3.Error as e:
+                    print(f"⚠️ LLM cache disk tier disabled ({self.path}): {e}")
+                    self.path = None
+                    return None
+                self._db, self._db_pid = db, os.getpid()
+        return self._db
+
+    def _disk_get(self, key: str, now: float) -> Optional[tuple]:
+        db = self._connection()
+        if db is None:
+            return None
+        try:
+            with self._db_lock:
+                row = db.execute(
+                    "SELECT payload, expires_at FROM verdicts WHERE key = ?", (key,)
+                ).fetchone()
+        except sqlite3.Error:
+            self.disk_errors += 1
+            return None
+        if row is not None and row[1] <= now:
+            self.expirations += 1
+            self._enqueue(("delete", key))
+            return None
+        return row
+
+    def _enqueue(self, operation: tuple) -> None:
+        """Hand a write to this process's writer thread, starting it on first use"""
+        if not self.path:
+            return
+        if self._writer_pid != os.getpid():
+            with self._db_lock:
+                if self._writer_pid != os.getpid():
+                    self._writes = queue.Queue(maxsize=WRITE_QUEUE_SIZE)
+                    self._writer = threading.Thread(target=self._write_loop, args=(self._writes,),
+                                                    name="llm-cache-writer", daemon=True)
+                    self._writer.start()
+                    self._writer_pid = os.getpid()
+        try:
+            self._writes.put_nowait(operation)
+        except queue.Full:
+            self.dropped_writes += 1
+
+    def _write_loop(self, writes: queue.Queue) -> None:
+        try:
+            db = _open_db(self.path)
+            self.disk_entries = db.execute("SELECT COUNT(*) FROM verdicts").fetchone()[0]
+        except sqlite3.Error as e:
+            print(f"⚠️ LLM cache writer disabled ({self.path}): {e}")
+            self.disk_errors += 1
+            return
+
+        while True:
+            batch = [writes.get()]
+            while len(batch) < WRITE_BATCH_SIZE:
+                try:
+                    batch.append(writes.get_nowait())
+                except queue.Empty:
+                    break
+            stop = any(operation is None for operation in batch)
+            try:
+                self._apply(db, [operation for operation in batch if operation is not None])
+            except sqlite3.Error:
+                self.disk_errors += 1
+                db.rollback()
+            if stop:
+                db.close()
+                return
+
+    def _apply(self, db: sqlite3.Connection, batch: list) -> None:
+        """Run one batch of queued writes in a single transaction (writer thread)"""
+        for operation in batch:
+            kind = operation[0]
+            if kind == "put":
+                exists = db.execute("SELECT 1 FROM verdicts WHERE key = ?", (operation[1],)).fetchone()
+                db.execute(
+                    "INSERT OR REPLACE INTO verdicts (key, payload, created_at, expires_at) VALUES (?, ?, ?, ?)",
+                    operation[1:]
+                )
+                self.disk_entries += 0 if exists else 1
+                self._writes_since_prune += 1
+            elif kind == "delete":
+                self.disk_entries -= db.execute("DELETE FROM verdicts WHERE key = ?", (operation[1],)).rowcount
+            elif kind == "clear":
+                db.execute("DELETE FROM verdicts")
+        if self._writes_since_prune >= DISK_PRUNE_EVERY or any(operation[0] == "clear" for operation in batch):
+            self._writes_since_prune = 0
+            self._prune(db, time.time())
+            self.disk_entries = db.execute("SELECT COUNT(*) FROM verdicts").fetchone()[0]
+        db.commit()
+
+    def _prune(self, db: sqlite3.Connection, now: float) -> None:
+        """Drop expired rows, then the oldest rows beyond disk_max_entries (writer thread)"""
+        db.execute("DELETE FROM verdicts WHERE expires_at <= ?", (now,))
+        db.execute(
+            "DELETE FROM verdicts WHERE key IN (SELECT key FROM verdicts ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+            (self.disk_max_entries,)
+        )
+
+    # === PUBLIC API ===
+
+    async def aget(self, key: str, loads: Callable[[str], T]) -> Optional[T]:
+        """Memory tier on the loop, disk tier in a worker thread"""
+        now = time.time()
+        payload = self._memory_get(key, now)
+        if payload is not None:
+            self.memory_hits += 1
+            return loads(payload)
+
+        row = await asyncio.to_thread(self._disk_get, key, now) if self.path else None
+        if row is not None:
+            self.disk_hits += 1
+            self._memory_put(key, row[0], row[1])
+            return loads(row[0])
+
+        self.misses += 1
+        return None
+
+    def put(self, key: str, payload: str) -> None:
+        """Store in memory now; the disk write happens on the writer thread"""
+        now = time.time()
+        expires_at = now + self.ttl_seconds
+        self.writes += 1
+        self._memory_put(key, payload, expires_at)
+        self._enqueue(("put", key, payload, now, expires_at))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+        self._enqueue(("clear",))
+
+    def close(self, timeout: float = 2.0) -> None:
+        """Flush queued writes and stop the writer thread"""
+        if self._writer is not None and self._writer_pid == os.getpid():
+            self._writes.put(None)
+            self._writer.join(timeout)
+            self._writer = None
+            self._writer_pid = None
+
+    def stats(self) -> Dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "disk_entries": self.disk_entries,
+            "disk_max_entries": self.disk_max_entries if self.path else None,
+            "ttl_seconds": self.ttl_seconds,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            "writes": self.writes,
+            "pending_writes": self._writes.qsize() if self._writes is not None else 0,
+            "dropped_writes": self.dropped_writes,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "disk_errors": self.disk_errors
+        }
+
+
+# Shared cache for this worker (the SQLite tier is shared by all workers)
+llm_verdict_cache = LLMVerdictCache()
@@ -11,52 +11,333 @@ Version: 2.0.2 - Exact Model Features
 import os
 import re
 import math
-from collections import Counter
-from urllib.parse import urlparse
-from typing import Dict, List
+import time
+import threading
+from collections import Counter, OrderedDict
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Union
 from pydantic import BaseModel
 import warnings
 
+from .keywords import KEYWORD_INDEX
+from .urls import parse_url
+from .homograph import find_lookalike
+from .blocklist import blocklist
+from .reference_data import reference_data
+
 warnings.filterwarnings('ignore', category=UserWarning)
 
+# Model storage configuration
+MODEL_PATH = os.getenv("MODEL_PATH", "rf_model.pkl")
+MODEL_STORAGE = os.getenv("MODEL_STORAGE", "pickle").lower()  # "pickle", "mmap" or "compact"
+MODEL_ARRAYS_DIR = os.getenv("MODEL_ARRAYS_DIR", "rf_model_arrays")
+MODEL_COMPACT_PATH = os.getenv("MODEL_COMPACT_PATH", "rf_model.tnb")
+
+# URL verdict cache configuration
+URL_CACHE_MAX_ENTRIES = int(os.getenv("URL_CACHE_MAX_ENTRIES", "10000"))
+URL_CACHE_TTL_SECONDS = float(os.getenv("URL_CACHE_TTL_SECONDS", "3600"))
+MODEL_CHECK_INTERVAL = float(os.getenv("MODEL_CHECK_INTERVAL", "30"))  # seconds between model file checks
+
 # Global model state
 model = None
 MODEL_LOADED = False
+MODEL_LOAD_SECONDS = None
+MODEL_WARM = False
+MODEL_SOURCE = None           # file the current model was loaded from
+MODEL_SIGNATURE = None        # (mtime_ns, size) of MODEL_SOURCE (and the pickle in mmap mode) at load time
+_model_checked_at = 0.0
+_model_lock = threading.RLock()
+
+# Representative URLs for the startup warm-up batch
+WARMUP_URLS = [
+    'https://www.absher.sa/wps/portal/individuals/Home',
+    'https://my.gov.sa/wps/portal/snp/main',
+    'bit.ly/3xYz12',
+    'http://secure-login.abshar-verify.com/account/update?id=12345&token=abc',
+    'http://192.168.10.22:8080/verify%3Alogin'
+]
 
 class URLPrediction(BaseModel):
     url: str
     prediction: int
     probability: float
     features: Dict[str, float]
+    lookalike_brand: Optional[str] = None      # protected brand the host imitates
+    lookalike_distance: Optional[int] = None   # skeleton edit distance to that brand
+    verdict_source: Optional[str] = None       # "model", "heuristic", "fallback" or "blocklist:<source>"
+
+    @property
+    def is_blocklisted(self) -> bool:
+        return bool(self.verdict_source) and self.verdict_source.startswith("blocklist:")
+
+class URLVerdictCache:
+    """
+    Bounded LRU cache of URL verdicts with a TTL
+    Keys are URLs as returned by extract_urls (already stripped of surrounding
+    punctuation); any further normalization would change the model features
+    """
+    
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # url -> (expires_at, prediction)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+    
+    def get(self, url: str) -> Optional[URLPrediction]:
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[url]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(url)
+            self.hits += 1
+            return entry[1]
+    
+    def put(self, url: str, prediction: URLPrediction) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[url] = (time.monotonic() + self.ttl_seconds, prediction)
+            self._entries.move_to_end(url)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def invalidate(self) -> None:
+        """Drop every entry (e.g. after the model changed)"""
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+    
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations
+            }
+
+url_cache = URLVerdictCache(URL_CACHE_MAX_ENTRIES, URL_CACHE_TTL_SECONDS)
+
+# Model input layout - features MUST be in this exact order
+FEATURE_ORDER = [
+    'url_length', 'number_of_dots_in_url', 'having_repeated_digits_in_url',
+    'number_of_digits_in_url', 'number_of_special_char_in_url', 'number_of_hyphens_in_url',
+    'number_of_underline_in_url', 'number_of_slash_in_url', 'number_of_questionmark_in_url',
+    'number_of_equal_in_url', 'number_of_at_in_url', 'number_of_dollar_in_url',
+    'number_of_exclamation_in_url', 'number_of_hashtag_in_url', 'number_of_percent_in_url',
+    'domain_length', 'number_of_dots_in_domain', 'number_of_hyphens_in_domain',
+    'having_special_characters_in_domain', 'number_of_special_characters_in_domain',
+    'having_digits_in_domain', 'number_of_digits_in_domain', 'having_repeated_digits_in_domain',
+    'number_of_subdomains', 'having_dot_in_subdomain', 'having_hyphen_in_subdomain',
+    'average_subdomain_length', 'average_number_of_dots_in_subdomain',
+    'average_number_of_hyphens_in_subdomain', 'having_special_characters_in_subdomain',
+    'number_of_special_characters_in_subdomain', 'having_digits_in_subdomain',
+    'number_of_digits_in_subdomain', 'having_repeated_digits_in_subdomain',
+    'having_path', 'path_length', 'having_query', 'having_fragment',
+    'having_anchor', 'entropy_of_url', 'entropy_of_domain'
+]
+
+# === Character classes for feature extraction ===
+URL_SPECIAL_CHARS = '!@#$%^&*()_+-=[]{}|;:,.<>?/~`'
+DOMAIN_SPECIAL_CHARS = '!@#$%^&*()_+=[]{}|;:,<>?/~`'
+URL_ENCODED_CHARS = ['%3A', '%2F', '%40', '%3F', '%3D', '%26']
+
+IP_PATTERN = re.compile(r'\b(?:[0-9]{1,3}\.){3}[0-9]{1,3}\b')
+HEURISTIC_IP_PATTERN = re.compile(r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}')
+REPEATED_DIGITS_PATTERN = re.compile(r'(\d)\1+')
+
+# Class lookup tables - totals intersect these with a string's histogram keys,
+# so each costs O(distinct chars) instead of another pass over the string
+ASCII_DIGITS = frozenset('0123456789')
+URL_SPECIAL_CLASS = frozenset(URL_SPECIAL_CHARS)
+DOMAIN_SPECIAL_CLASS = frozenset(DOMAIN_SPECIAL_CHARS)
+
+class CharProfile:
+    """Character histogram of a string, built in one pass, with class totals read from it"""
+    __slots__ = ('length', 'histogram', 'digits')
+    
+    def __init__(self, text: str):
+        histogram = Counter(text)
+        self.length = len(text)
+        self.histogram = histogram
+        if text.isascii():
+            self.digits = self.total(ASCII_DIGITS)
+        else:
+            # str.isdigit() also counts Arabic-Indic and other Unicode digits
+            self.digits = sum([count for c, count in histogram.items() if c.isdigit()])
+    
+    def count(self, char: str) -> int:
+        return self.histogram.get(char, 0)
+    
+    def total(self, char_class: frozenset) -> int:
+        histogram = self.histogram
+        return sum([histogram[c] for c in histogram.keys() & char_class])
+    
+    def entropy(self) -> float:
+        """Shannon entropy from the histogram (same summation order as calculate_entropy)"""
+        length = self.length
+        if not length:
+            return 0.0
+        entropy = 0.0 - sum([p * math.log2(p) for p in [count / length for count in self.histogram.values()]])
+        return round(entropy, 4)
+    
+    def repeated_digits(self, text: str) -> float:
+        """Repeated consecutive digits - only possible with two or more digits"""
+        if self.digits < 2:
+            return 0.0
+        return has_repeated_digits(text)
 
 def calculate_entropy(text: str) -> float:
     """Calculate Shannon entropy of text"""
     if not text:
         return 0.0
-    counter = Counter(text)
-    length = len(text)
-    entropy = 0.0
-    for count in counter.values():
-        p = count / length
-        if p > 0:
-            entropy -= p * math.log2(p)
-    return round(entropy, 4)
+    return CharProfile(text).entropy()
 
 def has_repeated_digits(text: str) -> float:
     """Check if text contains repeated consecutive digits (e.g., 11, 222, 3333)"""
-    return 1.0 if re.search(r'(\d)\1+', text) else 0.0
+    return 1.0 if REPEATED_DIGITS_PATTERN.search(text) else 0.0
 
 def load_model():
     """Lazy load ML model with proper error handling"""
-    global model, MODEL_LOADED
+    global MODEL_LOAD_SECONDS
     
     if MODEL_LOADED:
         return model
     
+    with _model_lock:
+        if MODEL_LOADED:
+            return model
+        start = time.perf_counter()
+        _record_model_source()
+        try:
+            return _load_model()
+        finally:
+            MODEL_LOAD_SECONDS = round(time.perf_counter() - start, 3)
+            print(f"⏱️ Model load finished in {MODEL_LOAD_SECONDS:.2f}s")
+
+def _model_source_path() -> str:
+    """File the next load_model() call will read"""
+    if MODEL_STORAGE == 'compact' and os.path.exists(MODEL_COMPACT_PATH):
+        return MODEL_COMPACT_PATH
+    if MODEL_STORAGE == 'mmap' and _arrays_current():
+        return os.path.join(MODEL_ARRAYS_DIR, 'meta.json')
+    return MODEL_PATH
+
+def _arrays_current() -> bool:
+    """Exported arrays exist and are not older than rf_model.pkl (a retrained pickle is re-exported)"""
+    arrays = _file_signature(os.path.join(MODEL_ARRAYS_DIR, 'meta.json'))
+    if arrays is None:
+        return False
+    pickle = _file_signature(MODEL_PATH)
+    return pickle is None or pickle[0] <= arrays[0]
+
+def _watched_signature() -> tuple:
+    """Signature of the model source; mmap mode also watches the pickle it was exported from"""
+    signature = (_file_signature(MODEL_SOURCE),)
+    if MODEL_STORAGE == 'mmap' and MODEL_SOURCE != MODEL_PATH:
+        signature += (_file_signature(MODEL_PATH),)
+    return signature
+
+def _file_signature(path: str) -> Optional[tuple]:
+    try:
+        stat = os.stat(path)
+        return (stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        return None
+
+def _record_model_source() -> None:
+    global MODEL_SOURCE, MODEL_SIGNATURE, _model_checked_at
+    MODEL_SOURCE = _model_source_path()
+    MODEL_SIGNATURE = _watched_signature()
+    _model_checked_at = time.monotonic()
+
+def reload_model():
+    """Reload the model from disk and invalidate cached URL verdicts"""
+    global model, MODEL_LOADED
+    
+    with _model_lock:
+        model = None
+        MODEL_LOADED = False
+        url_cache.invalidate()
+        return load_model()
+
+def check_model_file() -> bool:
+    """
+    Reload the model if its file changed on disk (checked at most every
+    MODEL_CHECK_INTERVAL seconds). Returns True when a reload happened
+    """
+    global _model_checked_at
+    
+    if not MODEL_LOADED or MODEL_SOURCE is None:
+        return False
+    now = time.monotonic()
+    if now - _model_checked_at < MODEL_CHECK_INTERVAL:
+        return False
+    _model_checked_at = now
+    
+    if _watched_signature() == MODEL_SIGNATURE:
+        return False
+    print(f"🔄 Model file {MODEL_SOURCE} changed. Reloading and invalidating URL cache...")
+    reload_model()
+    return True
+
+def load_compact_model(path: str):
+    """Load a compact quantized forest file (memory-mapped, no unpickling)"""
+    from .forest import CompactForest
+    
+    file_size = os.path.getsize(path)
+    print(f"📊 Loading compact ML model ({file_size / 1024:.2f} KB)...")
+    compact_model = CompactForest.load(path)
+    print(f"✅ Compact ML model loaded! {compact_model.n_estimators} trees, expects {compact_model.n_features_in_} features")
+    return compact_model
+
+def _load_model():
+    """Load the model (memory-mapped arrays or rf_model.pkl) and export it for inference"""
+    global model, MODEL_LOADED
+    
     try:
+        # Compact quantized file (see model_tools.py convert)
+        if MODEL_STORAGE == 'compact':
+            if os.path.exists(MODEL_COMPACT_PATH):
+                try:
+                    model = load_compact_model(MODEL_COMPACT_PATH)
+                    MODEL_LOADED = True
+                    return model
+                except ValueError as e:
+                    print(f"⚠️ {e}. Falling back to {MODEL_PATH}")
+            else:
+                print(f"⚠️ {MODEL_COMPACT_PATH} not found. Falling back to {MODEL_PATH}")
+        
+        # Memory-mapped arrays: no unpickling, pages shared by every worker
+        if MODEL_STORAGE == 'mmap' and _arrays_current():
+            from .forest import FlatForest
+            
+            print(f"📊 Mapping ML model arrays from {MODEL_ARRAYS_DIR}/...")
+            model = FlatForest.load(MODEL_ARRAYS_DIR, mmap_mode='r')
+            MODEL_LOADED = True
+            print(f"✅ ML model mapped! {model.n_estimators} trees, expects {model.n_features_in_} features")
+            return model
+        
         import joblib
         
-        model_path = 'rf_model.pkl'
+        model_path = MODEL_PATH
         if not os.path.exists(model_path):
             print("⚠️ Model file not found. Using heuristic scoring only.")
             MODEL_LOADED = True
@@ -75,7 +356,25 @@ def load_model():
                     MODEL_LOADED = True
                     return None
         
-        model = joblib.load(model_path)
+        from .forest import FlatForest
+        
+        loaded = joblib.load(model_path)
+        
+        # Export the forest to flat arrays - inference never goes through sklearn
+        if hasattr(loaded, 'estimators_'):
+            model = FlatForest.from_sklearn(loaded)
+            print(f"🌲 Forest flattened: {model.n_estimators} trees, {model.node_count} nodes")
+            
+            # First start (or a retrained pickle) in mmap mode: persist the arrays, then serve from the mapping
+            if MODEL_STORAGE == 'mmap':
+                try:
+                    model.save(MODEL_ARRAYS_DIR)
+                    model = FlatForest.load(MODEL_ARRAYS_DIR, mmap_mode='r')
+                    print(f"💾 Model arrays saved to {MODEL_ARRAYS_DIR}/ (memory-mapped)")
+                except OSError as e:
+                    print(f"⚠️ Could not save model arrays: {e}")
+        else:
+            model = loaded
         MODEL_LOADED = True
         
         # Print expected features for debugging
@@ -87,7 +386,7 @@ def load_model():
         return model
         
     except ImportError as e:
-        print(f"⚠️ joblib not installed: {e}")
+        print(f"⚠️ joblib/numpy not installed: {e}")
         MODEL_LOADED = True
         return None
     except Exception as e:
@@ -95,6 +394,53 @@ def load_model():
         MODEL_LOADED = True
         return None
 
+def warm_up_model() -> bool:
+    """Load the model and run one inference batch so the first request is not the slow one"""
+    global MODEL_WARM
+    
+    load_model()
+    try:
+        predict_urls(WARMUP_URLS)
+        MODEL_WARM = True
+    except Exception as e:
+        print(f"⚠️ Model warm-up failed: {e}")
+    return MODEL_WARM
+
+def is_model_loaded() -> bool:
+    """Check if the ML model is loaded (False means heuristic scoring)"""
+    return model is not None
+
+def get_process_memory() -> Dict:
+    """Resident and shared memory of this process in MB (Linux only)"""
+    try:
+        with open('/proc/self/statm') as f:
+            fields = f.read().split()
+        page_mb = os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+        return {
+            "rss_mb": round(int(fields[1]) * page_mb, 1),
+            "shared_mb": round(int(fields[2]) * page_mb, 1)
+        }
+    except (OSError, ValueError, IndexError):
+        return {"rss_mb": None, "shared_mb": None}
+
+def get_model_status() -> Dict:
+    """Current model state for health and readiness probes"""
+    return {
+        "load_attempted": MODEL_LOADED,
+        "model_loaded": model is not None,
+        "warm": MODEL_WARM,
+        "load_seconds": MODEL_LOAD_SECONDS,
+        "engine": type(model).__name__ if model is not None else "heuristic",
+        "storage": MODEL_STORAGE,
+        "pid": os.getpid(),
+        **get_process_memory()
+    }
+
+def split_url(url: str) -> tuple:
+    """Split URL into (domain, path, query, fragment) the way the model features expect"""
+    parsed = parse_url(url)
+    return parsed.netloc, parsed.path, parsed.query, parsed.fragment
+
 def extract_url_features(url: str) -> Dict[str, float]:
     """
     Extract exactly 41 features matching the trained model
@@ -102,102 +448,89 @@ def extract_url_features(url: str) -> Dict[str, float]:
     Implements cybersecurity best practices for URL analysis
     """
     
-    # Ensure URL has protocol for parsing
-    url_with_protocol = url if url.startswith('http') else f'http://{url}'
+    domain, path, query, fragment = split_url(url)
     
-    # Parse URL components
-    try:
-        parsed = urlparse(url_with_protocol)
-        domain = parsed.netloc
-        path = parsed.path
-        query = parsed.query
-        fragment = parsed.fragment
-    except Exception:
-        domain = url.split('/')[0] if '/' in url else url
-        path = ''
-        query = ''
-        fragment = ''
-    
-    # Initialize features dictionary (will be converted to ordered list later)
-    features = {}
-    
-    # === URL-level features (15 features) ===
-    features['url_length'] = len(url)
-    features['number_of_dots_in_url'] = url.count('.')
-    features['having_repeated_digits_in_url'] = has_repeated_digits(url)
-    features['number_of_digits_in_url'] = sum(c.isdigit() for c in url)
-    features['number_of_special_char_in_url'] = sum(c in '!@#$%^&*()_+-=[]{}|;:,.<>?/~`' for c in url)
-    features['number_of_hyphens_in_url'] = url.count('-')
-    features['number_of_underline_in_url'] = url.count('_')
-    features['number_of_slash_in_url'] = url.count('/')
-    features['number_of_questionmark_in_url'] = url.count('?')
-    features['number_of_equal_in_url'] = url.count('=')
-    features['number_of_at_in_url'] = url.count('@')
-    features['number_of_dollar_in_url'] = url.count('$')
-    features['number_of_exclamation_in_url'] = url.count('!')
-    features['number_of_hashtag_in_url'] = url.count('#')
-    features['number_of_percent_in_url'] = url.count('%')
+    # One pass each over the URL and the domain; every counter and both
+    # entropy histograms are read from these profiles
+    url_profile = CharProfile(url)
+    domain_profile = CharProfile(domain)
     
     # === Cybersecurity-enhanced features ===
     # Enhanced security check: IP address in URL (common phishing technique)
-    ip_pattern = r'\b(?:[0-9]{1,3}\.){3}[0-9]{1,3}\b'
-    has_ip = 1.0 if re.search(ip_pattern, url) else 0.0
-    features['number_of_special_char_in_url'] = features['number_of_special_char_in_url'] + has_ip  # Repurpose existing feature slightly
+    # A dotted quad needs at least 3 dots and 4 ASCII digits
+    if url_profile.count('.') >= 3 and url_profile.total(ASCII_DIGITS) >= 4:
+        has_ip = 1.0 if IP_PATTERN.search(url) else 0.0
+    else:
+        has_ip = 0.0
     
-    # Check for URL encoding (potential obfuscation) - incorporate into special chars
-    url_encoded_chars = ['%3A', '%2F', '%40', '%3F', '%3D', '%26']
-    has_url_encoding = 1.0 if any(enc in url.upper() for enc in url_encoded_chars) else 0.0
-    features['number_of_percent_in_url'] = features['number_of_percent_in_url'] + has_url_encoding  # Repurpose existing feature slightly
+    # Check for URL encoding (potential obfuscation)
+    if url_profile.count('%'):
+        url_upper = url.upper()
+        has_url_encoding = 1.0 if any(enc in url_upper for enc in URL_ENCODED_CHARS) else 0.0
+    else:
+        has_url_encoding = 0.0
     
-    # === Domain-level features (8 features) ===
-    features['domain_length'] = len(domain)
-    features['number_of_dots_in_domain'] = domain.count('.')
-    features['number_of_hyphens_in_domain'] = domain.count('-')
+    # === URL-level features (15 features) ===
+    # IP and URL-encoding flags are folded into the special-char and percent counters
+    features = {
+        'url_length': url_profile.length,
+        'number_of_dots_in_url': url_profile.count('.'),
+        'having_repeated_digits_in_url': url_profile.repeated_digits(url),
+        'number_of_digits_in_url': url_profile.digits,
+        'number_of_special_char_in_url': url_profile.total(URL_SPECIAL_CLASS) + has_ip,
+        'number_of_hyphens_in_url': url_profile.count('-'),
+        'number_of_underline_in_url': url_profile.count('_'),
+        'number_of_slash_in_url': url_profile.count('/'),
+        'number_of_questionmark_in_url': url_profile.count('?'),
+        'number_of_equal_in_url': url_profile.count('='),
+        'number_of_at_in_url': url_profile.count('@'),
+        'number_of_dollar_in_url': url_profile.count('$'),
+        'number_of_exclamation_in_url': url_profile.count('!'),
+        'number_of_hashtag_in_url': url_profile.count('#'),
+        'number_of_percent_in_url': url_profile.count('%') + has_url_encoding,
+    }
     
-    # Special characters in domain (excluding dots and hyphens)
-    special_chars_in_domain = sum(c in '!@#$%^&*()_+=[]{}|;:,<>?/~`' for c in domain)
+    # === Domain-level features (8 features) ===
+    special_chars_in_domain = domain_profile.total(DOMAIN_SPECIAL_CLASS)
+    digits_in_domain = domain_profile.digits
+    features['domain_length'] = domain_profile.length
+    features['number_of_dots_in_domain'] = domain_profile.count('.')
+    features['number_of_hyphens_in_domain'] = domain_profile.count('-')
     features['having_special_characters_in_domain'] = 1.0 if special_chars_in_domain > 0 else 0.0
     features['number_of_special_characters_in_domain'] = special_chars_in_domain
-    
-    # Digits in domain
-    digits_in_domain = sum(c.isdigit() for c in domain)
     features['having_digits_in_domain'] = 1.0 if digits_in_domain > 0 else 0.0
     features['number_of_digits_in_domain'] = digits_in_domain
-    features['having_repeated_digits_in_domain'] = has_repeated_digits(domain)
+    features['having_repeated_digits_in_domain'] = domain_profile.repeated_digits(domain)
     
     # === Subdomain features (10 features) ===
-    # Split domain into parts (e.g., www.example.com -> [www, example, com])
-    domain_parts = domain.split('.')
-    
     # Number of subdomains (parts before TLD, excluding main domain)
     # Example: www.mail.example.com -> 2 subdomains (www, mail)
-    num_subdomains = max(0, len(domain_parts) - 2)
+    num_subdomains = max(0, domain_profile.count('.') - 1)
     features['number_of_subdomains'] = num_subdomains
     
-    # Extract subdomains (everything except last 2 parts)
-    subdomains = domain_parts[:-2] if len(domain_parts) > 2 else []
-    
-    if subdomains:
-        # Analyze subdomains
+    if num_subdomains:
+        # Subdomains are everything before the second-to-last dot; they are
+        # scanned as one dot-joined region (dots are neither digits nor specials)
+        subdomain_region = domain.rsplit('.', 2)[0]
+        sub_profile = CharProfile(subdomain_region)
+        
         features['having_dot_in_subdomain'] = 0.0  # Subdomains don't contain dots (they're split by dots)
         
-        total_hyphens = sum(sub.count('-') for sub in subdomains)
+        total_hyphens = sub_profile.count('-')
         features['having_hyphen_in_subdomain'] = 1.0 if total_hyphens > 0 else 0.0
         
-        features['average_subdomain_length'] = sum(len(sub) for sub in subdomains) / len(subdomains)
+        features['average_subdomain_length'] = (sub_profile.length - (num_subdomains - 1)) / num_subdomains
         features['average_number_of_dots_in_subdomain'] = 0.0  # Subdomains are split by dots
-        features['average_number_of_hyphens_in_subdomain'] = total_hyphens / len(subdomains)
+        features['average_number_of_hyphens_in_subdomain'] = total_hyphens / num_subdomains
         
-        # Special characters in subdomains
-        special_in_sub = sum(sum(c in '!@#$%^&*()_+=[]{}|;:,<>?/~`' for c in sub) for sub in subdomains)
+        special_in_sub = sub_profile.total(DOMAIN_SPECIAL_CLASS)
         features['having_special_characters_in_subdomain'] = 1.0 if special_in_sub > 0 else 0.0
         features['number_of_special_characters_in_subdomain'] = special_in_sub
         
-        # Digits in subdomains
-        digits_in_sub = sum(sum(c.isdigit() for c in sub) for sub in subdomains)
+        digits_in_sub = sub_profile.digits
         features['having_digits_in_subdomain'] = 1.0 if digits_in_sub > 0 else 0.0
         features['number_of_digits_in_subdomain'] = digits_in_sub
-        features['having_repeated_digits_in_subdomain'] = 1.0 if any(has_repeated_digits(sub) for sub in subdomains) else 0.0
+        features['having_repeated_digits_in_subdomain'] = sub_profile.repeated_digits(subdomain_region)
     else:
         # No subdomains
         features['having_dot_in_subdomain'] = 0.0
@@ -219,58 +552,340 @@ def extract_url_features(url: str) -> Dict[str, float]:
     features['having_anchor'] = 1.0 if fragment else 0.0  # Anchor is same as fragment
     
     # === Entropy features (2 features) ===
-    features['entropy_of_url'] = calculate_entropy(url)
-    features['entropy_of_domain'] = calculate_entropy(domain)
+    features['entropy_of_url'] = url_profile.entropy()
+    features['entropy_of_domain'] = domain_profile.entropy()
     
     # Verify we have exactly 41 features
     assert len(features) == 41, f"Expected 41 features, got {len(features)}"
     
     return features
 
-def extract_urls(text: str) -> List[str]:
-    """Extract all URLs from text using multiple patterns - Implements cybersecurity best practices"""
-    urls = []
+def extract_url_features_matrix(urls: List[str], chunk_size: int = 4096):
+    """
+    Vectorized feature extraction for bulk scoring
+    Returns an N x 41 float32 matrix in FEATURE_ORDER with the same semantics
+    as extract_url_features (ASCII URLs are packed into a padded uint8 array;
+    anything else falls back to the scalar path row by row)
+    """
+    import numpy as np
     
-    # Pattern 1: Full URLs with protocol
-    urls.extend(re.findall(r'https?:\/\/[^\s]+', text))
+    matrix = np.empty((len(urls), len(FEATURE_ORDER)), dtype=np.float32)
+    for start in range(0, len(urls), chunk_size):
+        _fill_feature_rows(urls[start:start + chunk_size], matrix[start:start + chunk_size])
+    return matrix
+
+def _fill_feature_rows(urls: List[str], out) -> None:
+    """Compute one chunk of extract_url_features_matrix in place"""
+    import numpy as np
     
-    # Pattern 2: URLs without protocol
-    pattern = r'(?:^|\s)([a-zA-Z0-9-]+\.[a-zA-Z]{2,}(?:/[^\s]*)?)'
-    bare_urls = re.findall(pattern, text)
-    urls.extend([u for u in bare_urls if '.' in u and not u.endswith('.')])
+    n = len(urls)
+    if n == 0:
+        return
     
-    # Remove duplicates and clean
-    unique_urls = []
-    for url in urls:
-        # Security: Sanitize URL to prevent injection
-        url = url.strip('.,;:!?)]}')
-        
-        # Security: Validate URL format
-        if url and len(url) < 500:  # Prevent extremely long URLs
-            # Check for suspicious characters that might indicate obfuscation
-            if not any(suspicious in url.lower() for suspicious in ['javascript:', 'data:', 'vbscript:', 'file://']):
-                if url not in unique_urls:
-                    unique_urls.append(url)
+    # === Parse and pack (the only per-URL Python work) ===
+    packed = []
+    fallback = []
+    domain_start = np.zeros(n, dtype=np.int64)
+    domain_len = np.zeros(n, dtype=np.int64)
+    sub_len = np.zeros(n, dtype=np.int64)
+    path_len = np.zeros(n, dtype=np.int64)
+    having_path = np.zeros(n, dtype=bool)
+    having_query = np.zeros(n, dtype=bool)
+    having_fragment = np.zeros(n, dtype=bool)
+    
+    for i, url in enumerate(urls):
+        domain, path, query, fragment = split_url(url)
+        offset = url.find(domain) if domain else 0
+        if not url.isascii() or '\x00' in url or offset < 0:
+            # Unicode digits or a domain that is not a substring of the URL
+            fallback.append(i)
+            packed.append(b'')
+            continue
+        packed.append(url.encode('ascii'))
+        domain_start[i] = offset
+        domain_len[i] = len(domain)
+        if domain.count('.') >= 2:
+            sub_len[i] = len(domain.rsplit('.', 2)[0])
+        path_len[i] = len(path)
+        having_path[i] = bool(path) and path != '/'
+        having_query[i] = bool(query)
+        having_fragment[i] = bool(fragment)
     
-    return unique_urls
+    lengths = np.fromiter((len(b) for b in packed), dtype=np.int64, count=n)
+    width = max(int(lengths.max()), 1)
+    chars = np.zeros((n, width), dtype=np.uint8)
+    flat = np.frombuffer(b''.join(packed), dtype=np.uint8)
+    rows = np.repeat(np.arange(n), lengths)
+    cols = np.arange(flat.size) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    chars[rows, cols] = flat
+    
+    # === Region masks and per-row histograms ===
+    positions = np.arange(width)
+    in_url = positions < lengths[:, None]
+    in_domain = (positions >= domain_start[:, None]) & (positions < (domain_start + domain_len)[:, None])
+    in_sub = (positions >= domain_start[:, None]) & (positions < (domain_start + sub_len)[:, None])
+    bins = np.arange(n)[:, None] * 256 + chars
+    
+    def histogram(mask):
+        return np.bincount(bins[mask], minlength=n * 256).reshape(n, 256)
+    
+    url_hist = histogram(in_url)
+    domain_hist = histogram(in_domain)
+    sub_hist = histogram(in_sub)
+    
+    digit_codes = [ord(c) for c in '0123456789']
+    url_special_codes = [ord(c) for c in URL_SPECIAL_CHARS]
+    domain_special_codes = [ord(c) for c in DOMAIN_SPECIAL_CHARS]
+    
+    def count(hist, char):
+        return hist[:, ord(char)]
+    
+    def entropy(hist, length):
+        # Only non-empty bins contribute; sum them back per row
+        hist_rows, hist_codes = np.nonzero(hist)
+        p = hist[hist_rows, hist_codes] / length[hist_rows]
+        return np.round(0.0 - np.bincount(hist_rows, weights=p * np.log2(p), minlength=n), 4)
+    
+    # Repeated consecutive digits: adjacent equal characters that are digits
+    is_digit = (chars >= ord('0')) & (chars <= ord('9'))
+    repeats = is_digit[:, 1:] & (chars[:, 1:] == chars[:, :-1])
+    
+    def any_repeat(mask):
+        return (repeats & mask[:, 1:] & mask[:, :-1]).any(axis=1)
+    
+    # === IP and percent-encoding adjustments ===
+    url_dots = count(url_hist, '.')
+    url_digits = url_hist[:, digit_codes].sum(axis=1)
+    has_ip = np.zeros(n, dtype=np.int64)
+    for i in np.flatnonzero((url_dots >= 3) & (url_digits >= 4)):
+        has_ip[i] = 1 if IP_PATTERN.search(urls[i]) else 0
+    
+    upper = np.where((chars >= ord('a')) & (chars <= ord('z')), chars - 32, chars)
+    first, second = upper[:, 1:-1], upper[:, 2:]
+    encoded = (chars[:, :-2] == ord('%')) & (
+        ((first == ord('3')) & ((second == ord('A')) | (second == ord('F')) | (second == ord('D'))))
+        | ((first == ord('2')) & ((second == ord('F')) | (second == ord('6'))))
+        | ((first == ord('4')) & (second == ord('0')))
+    )
+    has_url_encoding = encoded.any(axis=1).astype(np.int64)
+    
+    # === Assemble columns ===
+    domain_specials = domain_hist[:, domain_special_codes].sum(axis=1)
+    domain_digits = domain_hist[:, digit_codes].sum(axis=1)
+    num_subdomains = np.maximum(count(domain_hist, '.') - 1, 0)
+    has_sub = num_subdomains > 0
+    safe_subdomains = np.maximum(num_subdomains, 1)
+    sub_hyphens = count(sub_hist, '-')
+    sub_specials = sub_hist[:, domain_special_codes].sum(axis=1)
+    sub_digits = sub_hist[:, digit_codes].sum(axis=1)
+    zeros = np.zeros(n)
+    
+    columns = {
+        'url_length': lengths,
+        'number_of_dots_in_url': url_dots,
+        'having_repeated_digits_in_url': any_repeat(in_url),
+        'number_of_digits_in_url': url_digits,
+        'number_of_special_char_in_url': url_hist[:, url_special_codes].sum(axis=1) + has_ip,
+        'number_of_hyphens_in_url': count(url_hist, '-'),
+        'number_of_underline_in_url': count(url_hist, '_'),
+        'number_of_slash_in_url': count(url_hist, '/'),
+        'number_of_questionmark_in_url': count(url_hist, '?'),
+        'number_of_equal_in_url': count(url_hist, '='),
+        'number_of_at_in_url': count(url_hist, '@'),
+        'number_of_dollar_in_url': count(url_hist, '$'),
+        'number_of_exclamation_in_url': count(url_hist, '!'),
+        'number_of_hashtag_in_url': count(url_hist, '#'),
+        'number_of_percent_in_url': count(url_hist, '%') + has_url_encoding,
+        'domain_length': domain_len,
+        'number_of_dots_in_domain': count(domain_hist, '.'),
+        'number_of_hyphens_in_domain': count(domain_hist, '-'),
+        'having_special_characters_in_domain': domain_specials > 0,
+        'number_of_special_characters_in_domain': domain_specials,
+        'having_digits_in_domain': domain_digits > 0,
+        'number_of_digits_in_domain': domain_digits,
+        'having_repeated_digits_in_domain': any_repeat(in_domain),
+        'number_of_subdomains': num_subdomains,
+        'having_dot_in_subdomain': zeros,
+        'having_hyphen_in_subdomain': sub_hyphens > 0,
+        'average_subdomain_length': np.where(has_sub, (sub_len - (num_subdomains - 1)) / safe_subdomains, 0.0),
+        'average_number_of_dots_in_subdomain': zeros,
+        'average_number_of_hyphens_in_subdomain': np.where(has_sub, sub_hyphens / safe_subdomains, 0.0),
+        'having_special_characters_in_subdomain': sub_specials > 0,
+        'number_of_special_characters_in_subdomain': sub_specials,
+        'having_digits_in_subdomain': sub_digits > 0,
+        'number_of_digits_in_subdomain': sub_digits,
+        'having_repeated_digits_in_subdomain': any_repeat(in_sub),
+        'having_path': having_path,
+        'path_length': path_len,
+        'having_query': having_query,
+        'having_fragment': having_fragment,
+        'having_anchor': having_fragment,  # Anchor is same as fragment
+        'entropy_of_url': entropy(url_hist, lengths),
+        'entropy_of_domain': entropy(domain_hist, domain_len),
+    }
+    
+    for j, name in enumerate(FEATURE_ORDER):
+        out[:, j] = columns[name]
+    
+    for i in fallback:
+        features = extract_url_features(urls[i])
+        out[i] = [features[name] for name in FEATURE_ORDER]
+
+def predict_url_probabilities(urls: List[str], chunk_size: int = 4096):
+    """
+    Bulk phishing probabilities (class 1) for offline rescoring
+    Skips per-URL feature dicts and URLPrediction objects entirely
+    """
+    import numpy as np
+    
+    current_model = load_model()
+    if current_model is None:
+        return np.array([heuristic_score(url) for url in urls])
+    
+    probabilities = np.empty(len(urls))
+    for start in range(0, len(urls), chunk_size):
+        batch = urls[start:start + chunk_size]
+        probabilities[start:start + len(batch)] = current_model.predict_proba(
+            extract_url_features_matrix(batch, chunk_size)
+        )[:, 1]
+    return probabilities
+
+# === URL extraction ===
+# One zero-width match per whitespace-delimited token that holds a URL:
+# - bare: a domain at the start of the token (legacy pattern 2)
+# - protocol: the first http(s):// in the token up to its end (legacy pattern 1)
+# Both are lookaheads, so a token like "site.com/http://x" yields both URLs
+BARE_URL = r'[a-zA-Z0-9-]+\.[a-zA-Z]{2,}(?:/\S*)?'
+PROTOCOL_URL = r'https?://\S+'
+URL_TOKEN_PATTERN = re.compile(
+    r'(?<!\S)(?=(?P<bare>' + BARE_URL + r'))?(?=\S*?(?P<protocol>' + PROTOCOL_URL + r'))?'
+    r'(?(bare)|(?(protocol)|(?!)))'
+)
+URL_STRIP_CHARS = '.,;:!?)]}'
+BLOCKED_URL_SCHEMES = ('javascript:', 'data:', 'vbscript:', 'file://')
+MAX_URL_LENGTH = 500
+
+
+class URLSpan(NamedTuple):
+    """A URL found in a message with its character and UTF-8 byte offsets"""
+    url: str
+    kind: str          # "protocol" or "bare"
+    start: int
+    end: int
+    byte_start: int
+    byte_end: int
+
+
+def _utf8_length(text: str) -> int:
+    return len(text) if text.isascii() else len(text.encode('utf-8', 'surrogatepass'))
+
+
+def _clean_url(raw: str) -> Optional[str]:
+    """Sanitized URL, or None if it must be dropped"""
+    # Security: Sanitize URL to prevent injection
+    url = raw.strip(URL_STRIP_CHARS)
+
+    # Security: Validate URL format and reject obfuscating schemes
+    if not url or len(url) >= MAX_URL_LENGTH:
+        return None
+    lowered = url.lower()
+    if any(scheme in lowered for scheme in BLOCKED_URL_SCHEMES):
+        return None
+    return url
+
+
+def _iter_url_matches(text: str) -> Iterator[tuple]:
+    """(kind, cleaned url, start offset) for each URL, in text order"""
+    for match in URL_TOKEN_PATTERN.finditer(text):
+        bare = match.group('bare')
+        if bare and not bare.endswith('.'):
+            url = _clean_url(bare)
+            if url:
+                yield 'bare', url, match.start('bare')
+        protocol = match.group('protocol')
+        if protocol:
+            url = _clean_url(protocol)
+            if url:
+                yield 'protocol', url, match.start('protocol')
+
+
+def _scan_segment(segment: str, char_base: int, byte_base: int) -> Iterator[URLSpan]:
+    """URL spans in a run of complete tokens, offsets relative to the whole input"""
+    ascii_only = segment.isascii()
+    cursor_char, cursor_byte = 0, byte_base
+    # Both patterns start on a character strip() keeps, so the raw start is the
+    # URL start, and starts only ever increase
+    for kind, url, start in _iter_url_matches(segment):
+        if ascii_only:
+            byte_start = byte_base + start
+        else:
+            cursor_byte += _utf8_length(segment[cursor_char:start])
+            cursor_char = start
+            byte_start = cursor_byte
+        yield URLSpan(
+            url=url,
+            kind=kind,
+            start=char_base + start,
+            end=char_base + start + len(url),
+            byte_start=byte_start,
+            byte_end=byte_start + _utf8_length(url)
+        )
+
+
+def iter_url_spans(text: Union[str, Iterable[str]]) -> Iterator[URLSpan]:
+    """
+    Stream URL spans (every occurrence, in text order) from a string or an
+    iterable of text chunks; only the unfinished last token of a chunk is
+    carried over, so memory stays bounded by the longest token
+    """
+    chunks = (text,) if isinstance(text, str) else text
+    pending = ''
+    char_offset = byte_offset = 0  # position of pending[0] in the whole input
+
+    for chunk in chunks:
+        # pending holds no whitespace, so only the new chunk can complete tokens
+        cut = len(chunk)
+        while cut and not chunk[cut - 1].isspace():
+            cut -= 1
+        if not cut:
+            pending += chunk
+            continue
+
+        complete = pending + chunk[:cut]
+        yield from _scan_segment(complete, char_offset, byte_offset)
+        char_offset += len(complete)
+        byte_offset += _utf8_length(complete)
+        pending = chunk[cut:]
+
+    if pending:
+        yield from _scan_segment(pending, char_offset, byte_offset)
+
+
+def extract_urls(text: str) -> List[str]:
+    """
+    Extract all URLs from text - Implements cybersecurity best practices
+    Single linear scan; URLs with a protocol come first, then bare domains,
+    each in order of first appearance
+    """
+    protocol_urls, bare_urls = [], []
+    for kind, url, _ in _iter_url_matches(text):
+        (protocol_urls if kind == 'protocol' else bare_urls).append(url)
+    return list(dict.fromkeys(protocol_urls + bare_urls))
 
 def heuristic_score(url: str) -> float:
     """Fallback heuristic scoring when ML model unavailable - Implements cybersecurity best practices"""
     score = 0.2  # Lower base score to reduce false positives
     
-    url_lower = url.lower()
-    parsed = urlparse(url if url.startswith('http') else f'http://{url}')
-    domain = parsed.netloc.lower()
+    parsed = parse_url(url)
+    domain = parsed.domain
     path = parsed.path.lower()
-    query = parsed.query.lower()
     
     # Check for URL shorteners (very high risk)
-    shorteners = ['bit.ly', 'tinyurl', 'goo.gl', 'ow.ly', 't.co', 'is.gd', 'cutt.ly', 'bitly', 'adf.ly', 'bc.vc', 'tiny.cc']
-    if any(short in url_lower for short in shorteners):
+    if reference_data.is_shortener(parsed):
         score += 0.50  # Very high penalty
     
     # Check for IP address instead of domain (high risk)
-    if re.search(r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}', url):
+    if HEURISTIC_IP_PATTERN.search(url):
         score += 0.40  # High penalty
     
     # Check for suspicious ports (non-standard ports)
@@ -287,15 +902,11 @@ def heuristic_score(url: str) -> float:
         score += 0.15
     
     # Check for suspicious keywords in domain/path
-    suspicious_keywords = ['login', 'verify', 'account', 'update', 'secure', 'banking', 'paypal', 'amazon',
-                          'microsoft', 'apple', 'google', 'facebook', 'login', 'signin', 'sign-in',
-                          'security', 'support', 'admin', 'webmail', 'ebay', 'amazon', 'sso']
-    if any(word in domain + path for word in suspicious_keywords):
+    if "url_keyword" in KEYWORD_INDEX.scan(domain + path):
         score += 0.20
     
     # Check for unusual TLDs (suspicious)
-    suspicious_tlds = ['.tk', '.ml', '.ga', '.cf', '.gq', '.xyz', '.top', '.work', '.info', '.biz', '.cc']
-    if any(tld in domain for tld in suspicious_tlds):
+    if reference_data.has_suspicious_tld(parsed):
         score += 0.25
     
     # Check for excessive length (potential obfuscation)
@@ -306,12 +917,8 @@ def heuristic_score(url: str) -> float:
     if any(char in domain for char in ['@', '$', '%', '!', '*', '(', ')']):
         score += 0.20
     
-    # Check for lookalike characters (homograph attacks)
-    lookalike_indicators = ['0' in domain and 'o' not in domain,  # Using 0 instead of o
-                          '1' in domain and 'l' not in domain,  # Using 1 instead of l
-                          'rn' in domain and 'm' not in domain,  # Using rn instead of m
-                          'vv' in domain and 'w' not in domain]  # Using vv instead of w
-    if any(lookalike_indicators):
+    # Check for lookalikes of protected brands (homograph attacks)
+    if find_lookalike(parsed):
         score += 0.30
     
     # Check for subdomain that mimics main domain
@@ -324,82 +931,150 @@ def heuristic_score(url: str) -> float:
     
     return min(1.0, score)
 
-def predict_url(url: str) -> URLPrediction:
-    """Predict if URL is phishing using ML or heuristic fallback"""
+def heuristic_prediction(url: str, features: Dict[str, float]) -> URLPrediction:
+    """Build a prediction from heuristic scoring"""
+    score = heuristic_score(url)
+    return URLPrediction(
+        url=url,
+        prediction=int(score > 0.6),
+        probability=round(score, 4),
+        features=features,
+        verdict_source="heuristic"
+    )
+
+def safe_prediction(url: str) -> URLPrediction:
+    """Neutral prediction returned when a URL cannot be scored"""
+    try:
+        features = extract_url_features(url)
+    except:
+        features = {}
+    return URLPrediction(
+        url=url,
+        prediction=0,
+        probability=0.5,
+        features=features,
+        verdict_source="fallback"
+    )
+
+def annotate_lookalike(pred: URLPrediction) -> URLPrediction:
+    """Attach the protected brand a URL imitates (if any) to its prediction"""
+    match = find_lookalike(parse_url(pred.url))
+    if match:
+        pred.lookalike_brand = match.brand
+        pred.lookalike_distance = match.distance
+    return pred
+
+def blocklist_prediction(url: str) -> Optional[URLPrediction]:
+    """Definitive phishing verdict for a blocklisted URL, or None"""
+    hit = blocklist.match(parse_url(url))
+    if hit is None:
+        return None
+    return annotate_lookalike(URLPrediction(
+        url=url,
+        prediction=1,
+        probability=1.0,
+        features={},
+        verdict_source=f"blocklist:{hit.source}"
+    ))
+
+def predict_urls(urls: List[str], check_blocklist: bool = True) -> List[URLPrediction]:
+    """
+    Predict a batch of URLs using ML or heuristic fallback
+    Blocklisted URLs and cached verdicts are served first; the misses are scored together with
+    one N x 41 matrix and a single forest run. Callers that already answered blocklisted URLs
+    (app.score_urls) pass check_blocklist=False
+    """
+    if not urls:
+        return []
+    
+    check_model_file()
+    if check_blocklist:
+        blocklist.check_for_updates()
+    
+    # Known-bad URLs get a definitive verdict without touching the model
+    predictions = [
+        (blocklist_prediction(url) if check_blocklist else None) or url_cache.get(url) for url in urls
+    ]
+    pending = [i for i, pred in enumerate(predictions) if pred is None]
+    
+    if pending:
+        scored = _score_urls([urls[i] for i in pending])
+        for i, pred in zip(pending, scored):
+            if pred is None:
+                # Failures are not cached - the next request retries
+                predictions[i] = annotate_lookalike(safe_prediction(urls[i]))
+            else:
+                url_cache.put(urls[i], annotate_lookalike(pred))
+                predictions[i] = pred
+    
+    return predictions
+
+def _score_urls(urls: List[str]) -> List[Optional[URLPrediction]]:
+    """Score URLs with one model call; None marks a URL that could not be scored"""
+    # Extract features per URL - a bad URL must not sink the whole batch
+    features_list = []
+    for url in urls:
+        try:
+            features_list.append(extract_url_features(url))
+        except Exception as e:
+            print(f"⚠️ Feature extraction error for {url}: {e}")
+            features_list.append(None)
+    
     try:
         import numpy as np
         
         # Load model (lazy loading)
         current_model = load_model()
         
-        # Extract features
-        features = extract_url_features(url)
-        
         if current_model is None:
             # Use heuristic scoring
-            score = heuristic_score(url)
-            return URLPrediction(
-                url=url,
-                prediction=int(score > 0.6),
-                probability=round(score, 4),
-                features=features
-            )
-        
-        # Use ML model - features MUST be in this exact order
-        feature_order = [
-            'url_length', 'number_of_dots_in_url', 'having_repeated_digits_in_url',
-            'number_of_digits_in_url', 'number_of_special_char_in_url', 'number_of_hyphens_in_url',
-            'number_of_underline_in_url', 'number_of_slash_in_url', 'number_of_questionmark_in_url',
-            'number_of_equal_in_url', 'number_of_at_in_url', 'number_of_dollar_in_url',
-            'number_of_exclamation_in_url', 'number_of_hashtag_in_url', 'number_of_percent_in_url',
-            'domain_length', 'number_of_dots_in_domain', 'number_of_hyphens_in_domain',
-            'having_special_characters_in_domain', 'number_of_special_characters_in_domain',
-            'having_digits_in_domain', 'number_of_digits_in_domain', 'having_repeated_digits_in_domain',
-            'number_of_subdomains', 'having_dot_in_subdomain', 'having_hyphen_in_subdomain',
-            'average_subdomain_length', 'average_number_of_dots_in_subdomain',
-            'average_number_of_hyphens_in_subdomain', 'having_special_characters_in_subdomain',
-            'number_of_special_characters_in_subdomain', 'having_digits_in_subdomain',
-            'number_of_digits_in_subdomain', 'having_repeated_digits_in_subdomain',
-            'having_path', 'path_length', 'having_query', 'having_fragment',
-            'having_anchor', 'entropy_of_url', 'entropy_of_domain'
-        ]
+            return [
+                heuristic_prediction(url, features) if features is not None else None
+                for url, features in zip(urls, features_list)
+            ]
         
-        # Create feature vector in exact order
-        feature_vector = np.array([[features[name] for name in feature_order]])
+        scored = [i for i, features in enumerate(features_list) if features is not None]
+        predictions = [None] * len(urls)
         
-        prediction = current_model.predict(feature_vector)[0]
-        probabilities = current_model.predict_proba(feature_vector)[0]
-        probability = probabilities[1]  # Probability of phishing (class 1)
+        if scored:
+            # Create feature matrix in exact order
+            feature_matrix = np.array([
+                [features_list[i][name] for name in FEATURE_ORDER] for i in scored
+            ])
+            
+            # One traversal per batch - the class label is the argmax of the probabilities
+            probabilities = current_model.predict_proba(feature_matrix)
+            labels = current_model.classes_[np.argmax(probabilities, axis=1)]
+            
+            for row, i in enumerate(scored):
+                probability = probabilities[row][1]  # Probability of phishing (class 1)
+                predictions[i] = URLPrediction(
+                    url=urls[i],
+                    prediction=int(labels[row]),
+                    probability=float(round(probability, 4)),
+                    features=features_list[i],
+                    verdict_source="model"
+                )
         
-        return URLPrediction(
-            url=url,
-            prediction=int(prediction),
-            probability=float(round(probability, 4)),
-            features=features
-        )
+        return predictions
         
     except ImportError:
         # NumPy not available, use heuristic
-        score = heuristic_score(url)
-        features = extract_url_features(url)
-        return URLPrediction(
-            url=url,
-            prediction=int(score > 0.6),
-            probability=round(score, 4),
-            features=features
-        )
+        return [
+            heuristic_prediction(url, features) if features is not None else None
+            for url, features in zip(urls, features_list)
+        ]
     except Exception as e:
         print(f"⚠️ URL prediction error: {e}")
         import traceback
         traceback.print_exc()
-        # Return safe prediction on error
-        try:
-            features = extract_url_features(url)
-        except:
-            features = {}
-        return URLPrediction(
-            url=url,
-            prediction=0,
-            probability=0.5,
-            features=features
-        )
\ No newline at end of file
+        # Caller falls back to safe predictions
+        return [None] * len(urls)
+
+def get_url_cache_stats() -> Dict:
+    """URL verdict cache counters for the metrics endpoint"""
+    return url_cache.stats()
+
+def predict_url(url: str) -> URLPrediction:
+    """Predict if URL is phishing using ML or heuristic fallback"""
+    return predict_urls([url])[0]
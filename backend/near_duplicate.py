@@ -0,0 +1,245 @@
+"""
+========================================
+Tanabbah - Near-Duplicate Module
+========================================
+Purpose: MinHash index that reuses LLM verdicts across campaign variants
+Author: Manal Alyami
+Version: 1.0.0 - MinHash LSH Index
+========================================
+"""
+
+import os
+import re
+import time
+import random
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, List, NamedTuple, Optional, Set, Tuple
+
+import numpy as np
+
+from .context import MessageContext
+
+# Configuration
+NEAR_DUPLICATE_THRESHOLD = float(os.getenv("NEAR_DUPLICATE_THRESHOLD", "0.7"))     # estimated Jaccard similarity
+NEAR_DUPLICATE_MAX_ENTRIES = int(os.getenv("NEAR_DUPLICATE_MAX_ENTRIES", "20000"))
+NEAR_DUPLICATE_TTL_SECONDS = float(os.getenv("NEAR_DUPLICATE_TTL_SECONDS", "21600"))
+NEAR_DUPLICATE_MIN_TOKENS = int(os.getenv("NEAR_DUPLICATE_MIN_TOKENS", "8"))      # shorter messages are never matched
+NEAR_DUPLICATE_AUDIT_RATE = float(os.getenv("NEAR_DUPLICATE_AUDIT_RATE", "0.05"))  # reuses re-checked by the LLM
+MINHASH_PERMUTATIONS = 64
+MINHASH_BANDS = 16  # 16 bands x 4 rows: pairs above ~0.5 similarity almost always share a band
+
+# === SHINGLES ===
+# Campaign variants differ in names, amounts, reference numbers and links, so
+# URLs collapse to one token and every digit run (Latin or Arabic-Indic) to another
+DIGIT_RUNS = re.compile(r'[0-9٠-٩۰-۹]+(?:[.,:/-][0-9٠-٩۰-۹]+)*')
+TOKENS = re.compile(r'\w+')
+
+
+def message_tokens(context: MessageContext) -> List[str]:
+    """Arabic-normalized, lowercased words with URLs and numbers masked"""
+    text = context.normalized
+    for url in sorted(context.urls, key=len, reverse=True):
+        text = text.replace(url.lower(), ' _url_ ')
+    text = DIGIT_RUNS.sub(' _num_ ', text)
+    return TOKENS.findall(text)
+
+
+def shingles(tokens: List[str]) -> Set[str]:
+    """Word unigrams and bigrams; a changed name only touches the features around it"""
+    return set(tokens) | {f"{a} {b}" for a, b in zip(tokens, tokens[1:])}
+
+
+# Multiply-shift hash family: h_i(x) = (a_i * x + b_i mod 2^64) >> 32, a_i odd
+_seeds = np.random.default_rng(20240601)
+_MULTIPLIERS = _seeds.integers(1, 2 ** 63, MINHASH_PERMUTATIONS, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+_OFFSETS = _seeds.integers(0, 2 ** 63, MINHASH_PERMUTATIONS, dtype=np.uint64)
+
+
+def minhash(features: Set[str]) -> np.ndarray:
+    """MinHash signature: the minimum of each hash function over the feature set"""
+    values = np.frombuffer(
+        b''.join(hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest() for feature in features),
+        dtype=np.uint64
+    )
+    hashed = (values[:, None] * _MULTIPLIERS[None, :] + _OFFSETS[None, :]) >> np.uint64(32)
+    return hashed.min(axis=0).astype(np.uint32)
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of two signatures"""
+    return float(np.count_nonzero(a == b)) / len(a)
+
+
+class NearDuplicateEntry(NamedTuple):
+    signature: np.ndarray        # MinHash signature
+    verdict: Any                 # the LLMAnalysis being reused
+    domains: FrozenSet[str]      # registrable domains of the message's URLs
+    all_urls_trusted: bool
+    expires_at: float
+
+
+class NearDuplicateHit(NamedTuple):
+    verdict: Any
+    similarity: float
+    audit: bool  # also run the LLM and compare, to measure verdict agreement
+
+
+class NearDuplicateIndex:
+    """
+    Recently analyzed messages by MinHash of their shingles
+    Signatures are split into bands (LSH): messages that share any band
+    exactly are candidates, so a lookup is a few dict probes and only near
+    duplicates are compared. Entries expire after a TTL and the least recently
+    used are evicted beyond max_entries.
+
+    A verdict is only reused when the new message has the same URL trust status;
+    a "safe" verdict additionally needs the same linked domains, so swapping the
+    link in a legitimate template never inherits its safe verdict
+    """
+
+    def __init__(self, threshold: float = NEAR_DUPLICATE_THRESHOLD, max_entries: int = NEAR_DUPLICATE_MAX_ENTRIES,
+                 ttl_seconds: float = NEAR_DUPLICATE_TTL_SECONDS, min_tokens: int = NEAR_DUPLICATE_MIN_TOKENS,
+                 audit_rate: float = NEAR_DUPLICATE_AUDIT_RATE):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.min_tokens = min_tokens
+        self.audit_rate = audit_rate
+        self._rows = MINHASH_PERMUTATIONS // MINHASH_BANDS
+        self._entries: "OrderedDict[bytes, NearDuplicateEntry]" = OrderedDict()  # signature bytes -> entry
+        self._buckets: List[Dict[bytes, Set[bytes]]] = [{} for _ in range(MINHASH_BANDS)]
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.reuses = 0
+        self.audits = 0
+        self.agreements = 0
+        self.disagreements = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def signature(self, context: MessageContext) -> Optional[np.ndarray]:
+        """MinHash of the message, or None when it is too short to match safely"""
+        tokens = message_tokens(context)
+        if len(tokens) < self.min_tokens:
+            return None
+        return minhash(shingles(tokens))
+
+    # === INDEX MAINTENANCE ===
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        rows = self._rows
+        return [signature[band * rows:(band + 1) * rows].tobytes() for band in range(MINHASH_BANDS)]
+
+    def _drop(self, key: bytes) -> None:
+        """Remove an entry and its band postings (caller holds _lock)"""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for bucket, band_key in zip(self._buckets, self._band_keys(entry.signature)):
+            postings = bucket.get(band_key)
+            if postings is not None:
+                postings.discard(key)
+                if not postings:
+                    del bucket[band_key]
+
+    def add(self, context: MessageContext, verdict: Any) -> None:
+        signature = self.signature(context)
+        if signature is None or self.max_entries <= 0:
+            return
+        key = signature.tobytes()
+        entry = NearDuplicateEntry(
+            signature, verdict, message_domains(context), context.all_urls_trusted,
+            time.time() + self.ttl_seconds
+        )
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            else:
+                for bucket, band_key in zip(self._buckets, self._band_keys(signature)):
+                    bucket.setdefault(band_key, set()).add(key)
+            self._entries[key] = entry
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    # === LOOKUPS ===
+
+    def find(self, context: MessageContext) -> Optional[NearDuplicateHit]:
+        """Most similar reusable verdict at or above the threshold, or None"""
+        signature = self.signature(context)
+        if signature is None:
+            return None
+        self.lookups += 1
+        domains = message_domains(context)
+        trusted = context.all_urls_trusted
+        now = time.time()
+
+        best: Optional[Tuple[float, bytes, NearDuplicateEntry]] = None
+        with self._lock:
+            candidates = set()
+            for bucket, band_key in zip(self._buckets, self._band_keys(signature)):
+                candidates.update(bucket.get(band_key, ()))
+            for key in candidates:
+                entry = self._entries[key]
+                if entry.expires_at <= now:
+                    self._drop(key)
+                    self.expirations += 1
+                    continue
+                if entry.all_urls_trusted != trusted:
+                    continue
+                if not getattr(entry.verdict, 'is_phishing', False) and entry.domains != domains:
+                    continue
+                score = similarity(signature, entry.signature)
+                if score >= self.threshold and (best is None or score > best[0]):
+                    best = (score, key, entry)
+            if best is None:
+                return None
+            self._entries.move_to_end(best[1])
+
+        self.reuses += 1
+        return NearDuplicateHit(best[2].verdict, best[0], random.random() < self.audit_rate)
+
+    def record_audit(self, reused: Any, fresh: Any) -> None:
+        """Compare a reused verdict with the LLM's verdict for the same message (once per LLM call)"""
+        self.audits += 1
+        if getattr(reused, 'is_phishing', None) == getattr(fresh, 'is_phishing', None):
+            self.agreements += 1
+        else:
+            self.disagreements += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            for bucket in self._buckets:
+                bucket.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict:
+        audited = self.agreements + self.disagreements
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            "ttl_seconds": self.ttl_seconds,
+            "lookups": self.lookups,
+            "reuses": self.reuses,
+            "reuse_rate": round(self.reuses / self.lookups, 4) if self.lookups else 0.0,
+            "audits": self.audits,
+            "agreements": self.agreements,
+            "disagreements": self.disagreements,
+            "agreement_rate": round(self.agreements / audited, 4) if audited else None,
+            "evictions": self.evictions,
+            "expirations": self.expirations
+        }
+
+
+def message_domains(context: MessageContext) -> FrozenSet[str]:
+    return frozenset(parsed.registrable_domain for parsed in context.parsed_urls)
+
+
+# Shared index for this worker
+near_duplicate_index = NearDuplicateIndex()
@@ -0,0 +1,77 @@
+"""
+========================================
+Tanabbah - Reference Data Module
+========================================
+Purpose: Shared URL shortener and suspicious TLD sets with exact-host matching
+Author: Manal Alyami
+Version: 1.0.0 - Frozenset Reference Data
+========================================
+"""
+
+import os
+from typing import Dict, FrozenSet
+
+from .urls import ParsedURL
+
+# Configuration
+DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+URL_SHORTENERS_PATH = os.getenv("URL_SHORTENERS_PATH", os.path.join(DATA_DIR, "url_shorteners.txt"))
+SUSPICIOUS_TLDS_PATH = os.getenv("SUSPICIOUS_TLDS_PATH", os.path.join(DATA_DIR, "suspicious_tlds.txt"))
+
+
+def load_entries(path: str) -> FrozenSet[str]:
+    """Lowercased non-comment lines of a reference file"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return frozenset(
+            line.strip().lower().lstrip('.') for line in f
+            if line.strip() and not line.lstrip().startswith('#')
+        )
+
+
+class ReferenceData:
+    """
+    Shortener hosts and suspicious TLDs as frozensets
+    Membership is by exact host / exact label suffix, so "t.co" no longer
+    matches microsoft.com and ".cc" no longer matches "accounts.example.com"
+    """
+
+    def __init__(self, shortener_hosts: FrozenSet[str] = frozenset(),
+                 suspicious_tlds: FrozenSet[str] = frozenset()):
+        self.shortener_hosts = shortener_hosts
+        self.suspicious_tlds = suspicious_tlds
+        self._max_tld_labels = max((tld.count('.') + 1 for tld in suspicious_tlds), default=0)
+
+    def is_shortener(self, parsed: ParsedURL) -> bool:
+        host = parsed.host
+        if host.startswith('www.'):
+            host = host[4:]
+        return host in self.shortener_hosts
+
+    def has_suspicious_tld(self, parsed: ParsedURL) -> bool:
+        labels = parsed.labels
+        for count in range(1, min(self._max_tld_labels, len(labels) - 1) + 1):
+            if '.'.join(labels[-count:]) in self.suspicious_tlds:
+                return True
+        return False
+
+    def stats(self) -> Dict:
+        return {
+            "shortener_hosts": len(self.shortener_hosts),
+            "suspicious_tlds": len(self.suspicious_tlds)
+        }
+
+
+def _load_reference_data() -> ReferenceData:
+    sets = {}
+    for name, path in (("shortener_hosts", URL_SHORTENERS_PATH), ("suspicious_tlds", SUSPICIOUS_TLDS_PATH)):
+        try:
+            sets[name] = load_entries(path)
+        except OSError as e:
+            print(f"⚠️ Could not load {name} from {path}: {e}")
+            sets[name] = frozenset()
+    print(f"📚 Loaded {len(sets['shortener_hosts'])} shortener hosts and {len(sets['suspicious_tlds'])} suspicious TLDs")
+    return ReferenceData(**sets)
+
+
+# Shared reference data, loaded at import
+reference_data = _load_reference_data()
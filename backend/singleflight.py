@@ -0,0 +1,57 @@
+"""
+========================================
+Tanabbah - Single-Flight Module
+========================================
+Purpose: Coalesce identical in-flight async calls into one shared execution
+Author: Manal Alyami
+Version: 1.0.0 - Keyed Single-Flight
+========================================
+"""
+
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time
+    The first caller starts the work as its own task; callers arriving with the
+    same key while it runs await that task instead of starting another. The
+    task is shielded, so a caller that disconnects doesn't cancel the work the
+    others are waiting on. Nothing is kept once the call finishes - caching
+    results is left to the caches in front of it
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        self.executions = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        call = self._calls.get(key)
+        if call is None:
+            call = asyncio.ensure_future(fn())
+            self._calls[key] = call
+            call.add_done_callback(lambda done: self._finish(key, done))
+            self.executions += 1
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(call)
+
+    def _finish(self, key: Hashable, call: asyncio.Future) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        if not call.cancelled():
+            call.exception()  # mark retrieved even if every caller has gone away
+
+    def stats(self) -> Dict:
+        requests = self.executions + self.coalesced
+        return {
+            "in_flight": len(self._calls),
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "coalesced_rate": round(self.coalesced / requests, 4) if requests else 0.0
+        }
@@ -0,0 +1,92 @@
+"""
+========================================
+Tanabbah - Red Flag Translation Module
+========================================
+Purpose: Translate red flags through a catalog compiled once and memoized
+Author: Manal Alyami
+Version: 1.0.0 - Data-Driven Translation Catalog
+========================================
+"""
+
+import os
+import json
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+from .keywords import KeywordIndex
+
+# Configuration
+RED_FLAGS_PATH = os.getenv("RED_FLAGS_PATH", os.path.join(os.path.dirname(__file__), "data", "red_flags.json"))
+TRANSLATION_CACHE_SIZE = int(os.getenv("TRANSLATION_CACHE_SIZE", "4096"))
+TRANSLATIONS_FORMAT_VERSION = 1
+
+
+class TranslationCatalog:
+    """
+    Red flag catalog: ordered (key, {language: text}) entries
+    Every key is matched in one pass with the shared keyword trie; a flag gets
+    the first entry in catalog order whose key it contains, as the old
+    dict scan did. Flags repeat heavily across requests, so results are memoized
+    """
+
+    def __init__(self, entries: List[Tuple[str, Dict[str, str]]], default_language: str = "ar",
+                 cache_size: int = TRANSLATION_CACHE_SIZE):
+        self.default_language = default_language
+        self._entries = entries
+        self._order = {key: position for position, (key, _) in reversed(list(enumerate(entries)))}
+        self._index = KeywordIndex({key: [key] for key in self._order})
+        self.languages = sorted({language for _, texts in entries for language in texts})
+        self._translate = lru_cache(maxsize=cache_size)(self._lookup)
+
+    @classmethod
+    def from_file(cls, path: str = RED_FLAGS_PATH) -> "TranslationCatalog":
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get("format_version") != TRANSLATIONS_FORMAT_VERSION:
+            raise ValueError(f"Unsupported translations format: {data.get('format_version')}")
+
+        entries = []
+        for entry in data.get("flags", []):
+            texts = {language: text for language, text in entry.items() if language != "key"}
+            entries.append((entry["key"].lower(), texts))
+        return cls(entries, data.get("default_language", "ar"))
+
+    def _lookup(self, flag: str, language: str) -> str:
+        hits = self._index.scan(flag.lower())
+        for key in sorted(hits.keywords, key=self._order.__getitem__):
+            text = self._entries[self._order[key]][1].get(language)
+            if text:
+                return text
+        return flag  # Return original if no translation found
+
+    def translate(self, flag: str, language: str = None) -> str:
+        return self._translate(flag, language or self.default_language)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict:
+        info = self._translate.cache_info()
+        lookups = info.hits + info.misses
+        return {
+            "entries": len(self._entries),
+            "languages": self.languages,
+            "cache_size": info.currsize,
+            "cache_hits": info.hits,
+            "cache_misses": info.misses,
+            "cache_hit_rate": round(info.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+def _load_catalog() -> TranslationCatalog:
+    try:
+        catalog = TranslationCatalog.from_file(RED_FLAGS_PATH)
+        print(f"🌐 Loaded {len(catalog)} red flag translations from {RED_FLAGS_PATH}")
+        return catalog
+    except (OSError, ValueError, KeyError) as e:
+        print(f"⚠️ Could not load red flag translations from {RED_FLAGS_PATH}: {e}")
+        return TranslationCatalog([])
+
+
+# Shared catalog, loaded at import
+red_flag_catalog = _load_catalog()
@@ -0,0 +1,122 @@
+"""
+========================================
+Tanabbah - Trusted Domain Index Module
+========================================
+Purpose: Allow-list lookups for trusted domains in O(labels)
+Author: Manal Alyami
+Version: 1.0.0 - Label-Reversed Trie
+========================================
+"""
+
+import os
+from functools import lru_cache
+from typing import Dict, Iterable, List
+
+# Configuration
+TRUSTED_DOMAINS_PATH = os.getenv(
+    "TRUSTED_DOMAINS_PATH", os.path.join(os.path.dirname(__file__), "data", "trusted_domains.txt")
+)
+TRUST_CACHE_SIZE = int(os.getenv("TRUST_CACHE_SIZE", "4096"))
+PROMPT_DOMAIN_LIMIT = 20
+
+# Marks on a trie node
+_TRUST_SELF = 'self'              # "example.sa": the domain and its subdomains
+_TRUST_SUBDOMAINS = 'subdomains'  # ".example.sa": subdomains only
+
+
+def host_of(url: str) -> str:
+    """Lowercased host part of a URL: after '://' and before the first '/'"""
+    host = url.lower()
+    if '://' in host:
+        host = host.split('://', 1)[1]
+    return host.split('/', 1)[0]
+
+
+class TrustedDomainIndex:
+    """
+    Trusted domains stored as a trie of reversed labels (sa -> gov -> moi)
+    A lookup walks the host's labels from the right and stops at the first
+    node that trusts it, so cost depends on the host, not the list size
+    """
+
+    def __init__(self, entries: Iterable[str] = (), cache_size: int = TRUST_CACHE_SIZE):
+        self._root: Dict = {}
+        self.entries: List[str] = []
+        for entry in entries:
+            self.add(entry)
+        self.is_trusted_host = lru_cache(maxsize=cache_size)(self._lookup)
+
+    @classmethod
+    def from_file(cls, path: str = TRUSTED_DOMAINS_PATH) -> "TrustedDomainIndex":
+        with open(path, 'r', encoding='utf-8') as f:
+            entries = [line.strip() for line in f if line.strip() and not line.lstrip().startswith('#')]
+        return cls(entries)
+
+    def add(self, entry: str) -> None:
+        entry = entry.strip().lower()
+        mark = _TRUST_SELF
+        if entry.startswith('.'):
+            entry, mark = entry[1:], _TRUST_SUBDOMAINS
+        if not entry:
+            return
+
+        node = self._root
+        for label in reversed(entry.split('.')):
+            node = node.setdefault(label, {})
+        # "example.sa" also covers ".example.sa"
+        if node.get('') != _TRUST_SELF:
+            node[''] = mark
+        self.entries.append(entry if mark == _TRUST_SELF else '.' + entry)
+
+        if hasattr(self, 'is_trusted_host'):
+            self.is_trusted_host.cache_clear()
+
+    def _lookup(self, host: str) -> bool:
+        labels = host.split('.')
+        node = self._root
+        for remaining in range(len(labels) - 1, -1, -1):
+            node = node.get(labels[remaining])
+            if node is None:
+                return False
+            mark = node.get('')
+            if mark == _TRUST_SELF or (mark == _TRUST_SUBDOMAINS and remaining > 0):
+                return True
+        return False
+
+    def is_trusted_url(self, url: str) -> bool:
+        return self.is_trusted_host(host_of(url))
+
+    def prompt_summary(self, limit: int = PROMPT_DOMAIN_LIMIT) -> str:
+        """Comma-separated allow-list for the LLM prompt, truncated for long lists"""
+        shown = ', '.join(self.entries[:limit])
+        if len(self.entries) > limit:
+            shown += f" (+{len(self.entries) - limit} more)"
+        return shown
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def stats(self) -> Dict:
+        info = self.is_trusted_host.cache_info()
+        lookups = info.hits + info.misses
+        return {
+            "domains": len(self.entries),
+            "cache_size": info.currsize,
+            "cache_hits": info.hits,
+            "cache_misses": info.misses,
+            "cache_hit_rate": round(info.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+def _load_index() -> TrustedDomainIndex:
+    try:
+        index = TrustedDomainIndex.from_file(TRUSTED_DOMAINS_PATH)
+        print(f"🛡️ Loaded {len(index)} trusted domains from {TRUSTED_DOMAINS_PATH}")
+        return index
+    except OSError as e:
+        print(f"⚠️ Could not load trusted domains from {TRUSTED_DOMAINS_PATH}: {e}")
+        return TrustedDomainIndex()
+
+
+# Shared index, loaded at import
+trusted_domains = _load_index()
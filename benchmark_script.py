@@ -0,0 +1,383 @@
+"""
+========================================
+Tanabbah Performance Benchmarks
+========================================
+Purpose: Measure hot paths of the analysis pipeline
+Author: Manal Alyami
+Version: 1.2.0
+========================================
+
+Usage:
+    python benchmark_script.py executors [--modes inline,thread,process] [--concurrency 64] [--requests 2000]
+    python benchmark_script.py extract-urls [--length 10000] [--iterations 200]
+    python benchmark_script.py llm-concurrency [--concurrency 1,4,16] [--requests 64] [--latency-ms 200]
+
+executors: every simulated request scores one or two unique URLs through the
+inference batcher, so the URL cache never hits. A probe coroutine stands in
+for /health and records how late the event loop wakes it up.
+
+extract-urls: compares extract_urls with the legacy two-regex extractor on
+messages packed with links, and checks that both return the same URLs.
+
+llm-concurrency: points the LLM client at a local stub server that answers
+every chat completion after a fixed delay, then compares calling the client
+directly on the event loop (the old behaviour) with the pooled LLM stage.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import string
+import sys
+import threading
+import time
+import warnings
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+
+warnings.filterwarnings('ignore', category=UserWarning)
+
+from backend.ml import predict_urls, warm_up_model, extract_urls
+from backend.batching import InferenceBatcher, EXECUTOR_MODES, ML_EXECUTOR_WORKERS
+
+# Configuration
+DEFAULT_CONCURRENCY = 64
+DEFAULT_REQUESTS = 2000
+DEFAULT_MESSAGE_LENGTH = 10000
+DEFAULT_ITERATIONS = 200
+DEFAULT_LLM_CONCURRENCY = "1,4,16"
+DEFAULT_LLM_REQUESTS = 64
+DEFAULT_LLM_LATENCY_MS = 200
+LLM_BENCH_MESSAGE = "عاجل: تم تعليق حسابك، حدّث بياناتك فوراً عبر الرابط http://account-verify-sa.com/login"
+STUB_VERDICT = {
+    "is_phishing": True, "confidence": 90, "reasoning": "stub verdict",
+    "red_flags": ["urgency tactics"], "context_score": 85
+}
+PROBE_INTERVAL_MS = 5
+URL_TEMPLATES = [
+    "http://{token}-verify.com/login?id={n}",
+    "https://secure-{token}.xyz/account/update",
+    "www.{token}.sa/services/{n}",
+    "bit.ly/{token}{n}",
+    "http://192.168.{a}.{b}/{token}/index.php",
+]
+
+
+def random_url(n: int) -> str:
+    """Unique URL so every request misses the verdict cache"""
+    token = ''.join(random.choices(string.ascii_lowercase + string.digits, k=8))
+    template = random.choice(URL_TEMPLATES)
+    return template.format(token=token, n=n, a=random.randint(0, 255), b=random.randint(0, 255))
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def probe_event_loop(lags: List[float], stop: asyncio.Event) -> None:
+    """Measure how late the loop runs a short sleep (what /health would feel)"""
+    interval = PROBE_INTERVAL_MS / 1000
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append((time.perf_counter() - start - interval) * 1000)
+
+
+async def run_mode(mode: str, concurrency: int, total_requests: int, workers: int) -> Dict[str, float]:
+    """Drive the batcher with `concurrency` concurrent clients in one executor mode"""
+    batcher = InferenceBatcher(predict_urls)
+    batcher.start(mode, workers)
+    await batcher.warm_up()
+
+    latencies: List[float] = []
+    lags: List[float] = []
+    counter = iter(range(total_requests))
+    stop = asyncio.Event()
+
+    async def client() -> None:
+        for n in counter:
+            urls = [random_url(n) for _ in range(random.choice((1, 2)))]
+            start = time.perf_counter()
+            await batcher.predict(urls)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    probe = asyncio.create_task(probe_event_loop(lags, stop))
+    start = time.perf_counter()
+    await asyncio.gather(*[client() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await probe
+    await batcher.shutdown()
+
+    stats = batcher.stats()
+    return {
+        "p50_ms": percentile(latencies, 50),
+        "p99_ms": percentile(latencies, 99),
+        "throughput_rps": total_requests / elapsed if elapsed else 0.0,
+        "loop_lag_p99_ms": percentile(lags, 99),
+        "loop_lag_max_ms": max(lags) if lags else 0.0,
+        "mean_batch_size": stats["batch_size"]["mean"],
+    }
+
+
+def run_executor_benchmark(args) -> int:
+    """Latency and loop lag for each ML_EXECUTOR mode"""
+    modes = [mode.strip() for mode in args.modes.split(",") if mode.strip()]
+    unknown = [mode for mode in modes if mode not in EXECUTOR_MODES]
+    if unknown:
+        print(f"❌ Unknown modes: {unknown} (expected {EXECUTOR_MODES})")
+        return 1
+
+    print("=" * 70)
+    print("⏱️ TANABBAH ML EXECUTOR BENCHMARK")
+    print("=" * 70)
+    print(f"   - Concurrency: {args.concurrency}")
+    print(f"   - Requests per mode: {args.requests}")
+    print(f"   - Pool workers: {args.workers}")
+    print()
+
+    if not warm_up_model():
+        print("❌ Model failed to load")
+        return 1
+
+    results = {}
+    for mode in modes:
+        print(f"🚀 Running '{mode}' mode...")
+        results[mode] = asyncio.run(run_mode(mode, args.concurrency, args.requests, args.workers))
+
+    print()
+    print("📊 Results (latency per request, loop lag = /health delay):")
+    print()
+    header = ["Mode", "p50 ms", "p99 ms", "req/s", "lag p99 ms", "lag max ms", "batch"]
+    print("".join(column.ljust(12) for column in header))
+    print("-" * 84)
+    for mode, result in results.items():
+        row = [
+            mode,
+            f"{result['p50_ms']:.2f}",
+            f"{result['p99_ms']:.2f}",
+            f"{result['throughput_rps']:.0f}",
+            f"{result['loop_lag_p99_ms']:.2f}",
+            f"{result['loop_lag_max_ms']:.2f}",
+            f"{result['mean_batch_size']:.1f}",
+        ]
+        print("".join(value.ljust(12) for value in row))
+    print()
+    return 0
+
+
+# === URL EXTRACTION ===
+
+def legacy_extract_urls(text: str) -> List[str]:
+    """The previous extractor (two findall passes, list dedup), kept as the baseline"""
+    urls = []
+    urls.extend(re.findall(r'https?:\/\/[^\s]+', text))
+    bare_urls = re.findall(r'(?:^|\s)([a-zA-Z0-9-]+\.[a-zA-Z]{2,}(?:/[^\s]*)?)', text)
+    urls.extend([u for u in bare_urls if '.' in u and not u.endswith('.')])
+
+    unique_urls = []
+    for url in urls:
+        url = url.strip('.,;:!?)]}')
+        if url and len(url) < 500:
+            if not any(suspicious in url.lower() for suspicious in ['javascript:', 'data:', 'vbscript:', 'file://']):
+                if url not in unique_urls:
+                    unique_urls.append(url)
+    return unique_urls
+
+
+def link_packed_message(length: int) -> str:
+    """Arabic/English message of about `length` characters that is mostly unique links"""
+    words = ["عاجل", "تحديث", "حسابك", "urgent", "verify", "الرابط:", "click"]
+    parts, size, n = [], 0, 0
+    while size < length:
+        part = random_url(n) if n % 3 else random.choice(words)
+        parts.append(part)
+        size += len(part) + 1
+        n += 1
+    return " ".join(parts)[:length]
+
+
+def time_extractor(extractor, messages: List[str]) -> List[float]:
+    timings = []
+    for message in messages:
+        start = time.perf_counter()
+        extractor(message)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def run_extract_benchmark(args) -> int:
+    """extract_urls vs the legacy extractor on link-packed messages"""
+    messages = [link_packed_message(args.length) for _ in range(args.iterations)]
+
+    print("=" * 70)
+    print("🔗 TANABBAH URL EXTRACTION BENCHMARK")
+    print("=" * 70)
+    print(f"   - Message length: {args.length} characters")
+    print(f"   - Messages: {args.iterations}")
+    print(f"   - URLs per message: ~{len(extract_urls(messages[0]))}")
+    print()
+
+    mismatches = sum(1 for message in messages if extract_urls(message) != legacy_extract_urls(message))
+    results = {
+        "legacy": time_extractor(legacy_extract_urls, messages),
+        "current": time_extractor(extract_urls, messages),
+    }
+
+    print("".join(column.ljust(12) for column in ["Extractor", "p50 ms", "p99 ms", "mean ms"]))
+    print("-" * 48)
+    for name, timings in results.items():
+        row = [name, f"{percentile(timings, 50):.3f}", f"{percentile(timings, 99):.3f}",
+               f"{sum(timings) / len(timings):.3f}"]
+        print("".join(value.ljust(12) for value in row))
+    print()
+
+    if mismatches:
+        print(f"❌ {mismatches} messages extracted differently from the legacy extractor")
+        return 1
+    print("✅ Output identical to the legacy extractor")
+    return 0
+
+
+# === LLM CONCURRENCY ===
+
+def start_stub_llm_server(latency_ms: int) -> ThreadingHTTPServer:
+    """OpenAI-compatible chat completion endpoint that answers after latency_ms"""
+    content = json.dumps(STUB_VERDICT)
+    body = json.dumps({
+        "id": "stub", "object": "chat.completion", "created": 0, "model": "stub",
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+    }).encode()
+
+    class StubHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            time.sleep(latency_ms / 1000)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+async def run_llm_level(mode: str, concurrency: int, total_requests: int) -> Dict[str, float]:
+    """Drive the LLM stage with `concurrency` clients; 'blocking' calls the client on the loop"""
+    from backend import llm
+    from backend.context import MessageContext
+
+    # A distinct message per request, so identical in-flight calls aren't coalesced into one
+    contexts = [MessageContext(f"{LLM_BENCH_MESSAGE} ({n})") for n in range(total_requests)]
+    latencies: List[float] = []
+    lags: List[float] = []
+    counter = iter(range(total_requests))
+    stop = asyncio.Event()
+
+    async def client() -> None:
+        for n in counter:
+            context = contexts[n]
+            start = time.perf_counter()
+            if mode == "blocking":
+                llm.request_llm_completion([{"role": "user", "content": context.text}])
+            else:
+                await llm.analyze_message_with_llm(context)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    probe = asyncio.create_task(probe_event_loop(lags, stop))
+    start = time.perf_counter()
+    await asyncio.gather(*[client() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await probe
+
+    return {
+        "p50_ms": percentile(latencies, 50),
+        "throughput_rps": total_requests / elapsed if elapsed else 0.0,
+        "loop_lag_max_ms": max(lags) if lags else 0.0,
+    }
+
+
+def run_llm_benchmark(args) -> int:
+    """Throughput of the LLM stage against a stub server at several concurrency levels"""
+    levels = [int(level) for level in args.concurrency.split(",") if level.strip()]
+    server = start_stub_llm_server(args.latency_ms)
+    os.environ["LLM_BASE_URL"] = f"http://127.0.0.1:{server.server_port}"
+    os.environ["LLM_MAX_CONCURRENCY"] = str(args.pool_size)
+    # Every request repeats one message: turn the verdict caches off so each one reaches the stub
+    os.environ["LLM_CACHE_PATH"] = ""
+    os.environ["LLM_CACHE_MAX_ENTRIES"] = "0"
+    os.environ["NEAR_DUPLICATE_MAX_ENTRIES"] = "0"
+    from backend import llm  # reads the endpoint and pool size at import
+
+    print("=" * 70)
+    print("🧠 TANABBAH LLM CONCURRENCY BENCHMARK")
+    print("=" * 70)
+    print(f"   - Stub latency: {args.latency_ms} ms")
+    print(f"   - Requests per level: {args.requests}")
+    print(f"   - LLM pool size: {llm.llm_call_pool.max_workers}")
+    print()
+
+    header = ["Mode", "Clients", "p50 ms", "req/s", "lag max ms"]
+    print("".join(column.ljust(12) for column in header))
+    print("-" * 60)
+    for mode in ("blocking", "pooled"):
+        for level in levels:
+            result = asyncio.run(run_llm_level(mode, level, args.requests))
+            row = [mode, str(level), f"{result['p50_ms']:.1f}", f"{result['throughput_rps']:.1f}",
+                   f"{result['loop_lag_max_ms']:.1f}"]
+            print("".join(value.ljust(12) for value in row))
+    print()
+
+    llm.llm_call_pool.shutdown()
+    server.shutdown()
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Tanabbah performance benchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    executors = subparsers.add_parser("executors", help="Compare ML_EXECUTOR modes under concurrency")
+    executors.add_argument("--modes", default=",".join(EXECUTOR_MODES), help="Comma-separated executor modes")
+    executors.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Concurrent clients")
+    executors.add_argument("--requests", type=int, default=DEFAULT_REQUESTS, help="Total simulated requests per mode")
+    executors.add_argument("--workers", type=int, default=ML_EXECUTOR_WORKERS, help="Thread/process pool size")
+
+    extract = subparsers.add_parser("extract-urls", help="Time extract_urls on link-packed messages")
+    extract.add_argument("--length", type=int, default=DEFAULT_MESSAGE_LENGTH, help="Message length in characters")
+    extract.add_argument("--iterations", type=int, default=DEFAULT_ITERATIONS, help="Messages to time")
+
+    llm_bench = subparsers.add_parser("llm-concurrency", help="LLM stage throughput against a local stub server")
+    llm_bench.add_argument("--concurrency", default=DEFAULT_LLM_CONCURRENCY, help="Comma-separated client counts")
+    llm_bench.add_argument("--requests", type=int, default=DEFAULT_LLM_REQUESTS, help="Requests per concurrency level")
+    llm_bench.add_argument("--latency-ms", type=int, default=DEFAULT_LLM_LATENCY_MS, help="Stub response delay")
+    llm_bench.add_argument("--pool-size", type=int, default=16, help="LLM_MAX_CONCURRENCY for the run")
+
+    args = parser.parse_args()
+
+    if args.command == "executors":
+        return run_executor_benchmark(args)
+    if args.command == "extract-urls":
+        return run_extract_benchmark(args)
+    if args.command == "llm-concurrency":
+        return run_llm_benchmark(args)
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,52 @@
+"""
+========================================
+Tanabbah - Gunicorn Configuration
+========================================
+Purpose: Multi-worker serving with one shared copy of the ML model
+Author: Manal Alyami
+Version: 1.0.0
+========================================
+
+The app (and the model) is loaded once in the master before fork. Workers
+inherit the forest arrays copy-on-write; with MODEL_STORAGE=mmap they are
+file-backed mappings shared through the page cache instead.
+"""
+
+import os
+import gc
+import time
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8080')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+worker_class = "uvicorn.workers.UvicornWorker"
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+
+# Import the app in the master so the model is loaded before workers fork
+preload_app = True
+
+
+def when_ready(server):
+    """Load the model in the master, then freeze the heap so workers don't dirty it"""
+    from backend.ml import load_model, get_model_status
+
+    start = time.perf_counter()
+    load_model()
+    # Objects created so far are never scanned by the GC again, so their
+    # pages stay shared with the workers instead of being copied on write
+    gc.freeze()
+    status = get_model_status()
+    server.log.info(
+        f"Master model load {time.perf_counter() - start:.2f}s "
+        f"(storage: {status['storage']}, RSS: {status['rss_mb']} MB)"
+    )
+
+
+def post_worker_init(worker):
+    """Report per-worker memory after fork"""
+    from backend.ml import get_model_status
+
+    status = get_model_status()
+    worker.log.info(
+        f"Worker {status['pid']} started (model loaded: {status['model_loaded']}, "
+        f"RSS: {status['rss_mb']} MB, shared: {status['shared_mb']} MB)"
+    )
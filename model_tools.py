@@ -0,0 +1,242 @@
+"""
+========================================
+Tanabbah Model Tools
+========================================
+Purpose: Export, convert and verify the flat forest engine against the sklearn pickle,
+         and check lookalike detection against known cases
+Author: Manal Alyami
+Version: 1.0.0
+========================================
+
+Usage:
+    python model_tools.py parity [--urls FILE]
+    python model_tools.py export-arrays [--out DIR]
+    python model_tools.py convert [--out FILE] [--holdout FILE]
+    python model_tools.py lookalikes [--cases FILE]
+
+URL files hold one URL per line, optionally followed by a tab and a 0/1 label.
+Lookalike case files hold a URL, a tab, and the brand it must match (- for none).
+"""
+
+import argparse
+import json
+import sys
+import time
+import warnings
+from typing import List, Optional, Tuple
+
+warnings.filterwarnings('ignore', category=UserWarning)
+
+from backend.ml import extract_urls, extract_url_features, FEATURE_ORDER
+
+# Configuration
+MODEL_PATH = 'rf_model.pkl'
+ARRAYS_DIR = 'rf_model_arrays'
+COMPACT_PATH = 'rf_model.tnb'
+EVAL_DATASET_PATH = 'eval_dataset.json'
+LOOKALIKE_CASES_PATH = 'lookalike_cases.txt'
+PARITY_TOLERANCE = 1e-9
+
+
+def load_eval_urls(filepath: str = EVAL_DATASET_PATH) -> List[str]:
+    """Collect every URL mentioned in the evaluation dataset"""
+    with open(filepath, 'r', encoding='utf-8') as f:
+        dataset = json.load(f)
+
+    urls = []
+    for case in dataset.get("test_cases", []):
+        for url in extract_urls(case.get("message", "")):
+            if url not in urls:
+                urls.append(url)
+    return urls
+
+
+def load_url_file(filepath: str) -> List[str]:
+    """Load a URL list (one per line, first column if tab-separated)"""
+    return load_labeled_urls(filepath)[0]
+
+
+def load_labeled_urls(filepath: str) -> Tuple[List[str], Optional[List[int]]]:
+    """Load URLs and their labels; labels are None unless every line has one"""
+    urls, labels = [], []
+    with open(filepath, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip() or line.startswith('#'):
+                continue
+            columns = line.rstrip('\n').split('\t')
+            urls.append(columns[0].strip())
+            labels.append(int(columns[1]) if len(columns) > 1 and columns[1].strip() else None)
+    return urls, (labels if urls and None not in labels else None)
+
+
+def build_feature_matrix(urls: List[str]):
+    """Feature matrix through the same scalar path the API uses"""
+    import numpy as np
+    return np.array([[extract_url_features(url)[name] for name in FEATURE_ORDER] for url in urls])
+
+
+def run_parity(urls: List[str]) -> bool:
+    """Compare FlatForest.predict_proba with the sklearn model on the given URLs"""
+    import joblib
+    from backend.forest import FlatForest
+
+    print(f"📊 Loading sklearn model from {MODEL_PATH}...")
+    sklearn_model = joblib.load(MODEL_PATH)
+
+    start = time.perf_counter()
+    forest = FlatForest.from_sklearn(sklearn_model)
+    print(f"🌲 Exported {forest.n_estimators} trees / {forest.node_count} nodes in {time.perf_counter() - start:.2f}s")
+
+    X = build_feature_matrix(urls)
+    expected = sklearn_model.predict_proba(X)
+    actual = forest.predict_proba(X)
+
+    max_diff = float(abs(expected - actual).max()) if len(urls) else 0.0
+    label_mismatches = int((sklearn_model.predict(X) != forest.predict(X)).sum())
+
+    print(f"🔗 URLs compared: {len(urls)}")
+    print(f"📈 Max probability difference: {max_diff:.3e} (tolerance {PARITY_TOLERANCE:.0e})")
+    print(f"🏷️ Label mismatches: {label_mismatches}")
+
+    return max_diff <= PARITY_TOLERANCE and label_mismatches == 0
+
+
+def export_arrays(directory: str) -> None:
+    """Write the forest as memory-mappable .npy arrays (MODEL_STORAGE=mmap)"""
+    import joblib
+    from backend.forest import FlatForest
+
+    start = time.perf_counter()
+    forest = FlatForest.from_sklearn(joblib.load(MODEL_PATH))
+    forest.save(directory)
+    print(f"💾 Saved {forest.node_count} nodes to {directory}/ in {time.perf_counter() - start:.2f}s")
+
+    start = time.perf_counter()
+    FlatForest.load(directory, mmap_mode='r')
+    print(f"⚡ Memory-mapped load: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+
+def report_drift(name: str, urls: List[str], labels: Optional[List[int]], reference, compact,
+                 sizes: Optional[Tuple[float, float]] = None) -> None:
+    """Print probability and accuracy drift of the compact model against the pickle"""
+    import numpy as np
+
+    if not urls:
+        print(f"⚠️ {name}: no URLs")
+        return
+
+    X = build_feature_matrix(urls)
+    expected = reference.predict_proba(X)[:, 1]
+    actual = compact.predict_proba(X)[:, 1]
+    diff = np.abs(expected - actual)
+    agreement = float((reference.predict(X) == compact.predict(X)).mean())
+
+    print(f"📋 {name} ({len(urls)} URLs):")
+    if sizes:
+        print(f"   - File size: compact {sizes[0]:,.0f} KB / pickle {sizes[1]:,.0f} KB ({sizes[0] / sizes[1]:.0%})")
+    print(f"   - Max probability drift: {diff.max():.2e}")
+    print(f"   - Mean probability drift: {diff.mean():.2e}")
+    print(f"   - Drift after API rounding (4 dp): {int((np.round(expected, 4) != np.round(actual, 4)).sum())} URLs")
+    print(f"   - Label agreement: {agreement:.2%}")
+    if labels is not None:
+        truth = np.asarray(labels)
+        reference_accuracy = float((reference.predict(X) == truth).mean())
+        compact_accuracy = float((compact.predict(X) == truth).mean())
+        print(f"   - Accuracy: pickle {reference_accuracy:.2%} / compact {compact_accuracy:.2%} "
+              f"(drift {compact_accuracy - reference_accuracy:+.2%})")
+
+
+def convert_model(path: str, holdout: Optional[str]) -> None:
+    """Convert the pickle to the compact format and report accuracy drift"""
+    import os
+    import joblib
+    from backend.forest import FlatForest, CompactForest
+
+    sklearn_model = joblib.load(MODEL_PATH)
+    FlatForest.from_sklearn(sklearn_model).save_compact(path)
+    compact_kb = os.path.getsize(path) / 1024
+    pickle_kb = os.path.getsize(MODEL_PATH) / 1024
+    print(f"💾 Compact model written to {path}")
+
+    start = time.perf_counter()
+    compact = CompactForest.load(path)
+    print(f"⚡ Compact load: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    sizes = (compact_kb, pickle_kb)
+    report_drift("Eval dataset", load_eval_urls(), None, sklearn_model, compact, sizes)
+    if holdout:
+        holdout_urls, holdout_labels = load_labeled_urls(holdout)
+        report_drift("Held-out URLs", holdout_urls, holdout_labels, sklearn_model, compact, sizes)
+
+
+def check_lookalikes(filepath: str) -> bool:
+    """Run every case through the homograph engine and report the ones that disagree"""
+    from backend.homograph import find_lookalike
+    from backend.urls import parse_url
+
+    failures = total = 0
+    with open(filepath, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip() or line.startswith('#'):
+                continue
+            url, expected = line.rstrip('\n').split('\t')
+            match = find_lookalike(parse_url(url))
+            actual = match.brand if match else '-'
+            total += 1
+            if actual != expected.strip():
+                failures += 1
+                print(f"   ❌ {url}: expected {expected.strip()}, got {actual}")
+
+    print(f"📊 {total - failures}/{total} lookalike cases passed")
+    return failures == 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Tanabbah model tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    parity = subparsers.add_parser("parity", help="Check flat forest against sklearn predict_proba")
+    parity.add_argument("--urls", help="Extra URL file to include alongside the eval dataset")
+
+    export = subparsers.add_parser("export-arrays", help="Save the forest as memory-mappable .npy files")
+    export.add_argument("--out", default=ARRAYS_DIR, help="Output directory")
+
+    convert = subparsers.add_parser("convert", help="Write the compact quantized model and report drift")
+    convert.add_argument("--out", default=COMPACT_PATH, help="Output file")
+    convert.add_argument("--holdout", help="Held-out URL file (url[TAB]label per line)")
+
+    lookalikes = subparsers.add_parser("lookalikes", help="Check lookalike detection against known cases")
+    lookalikes.add_argument("--cases", default=LOOKALIKE_CASES_PATH, help="Case file (url[TAB]brand or - per line)")
+
+    args = parser.parse_args()
+
+    if args.command == "parity":
+        urls = load_eval_urls()
+        if args.urls:
+            urls += load_url_file(args.urls)
+        if run_parity(urls):
+            print("✅ Parity check PASSED")
+            return 0
+        print("❌ Parity check FAILED")
+        return 1
+
+    if args.command == "export-arrays":
+        export_arrays(args.out)
+        return 0
+
+    if args.command == "convert":
+        convert_model(args.out, args.holdout)
+        return 0
+
+    if args.command == "lookalikes":
+        if check_lookalikes(args.cases):
+            print("✅ Lookalike check PASSED")
+            return 0
+        print("❌ Lookalike check FAILED")
+        return 1
+
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())